@@ -0,0 +1,63 @@
+from settings import *
+from support import optimize_surface
+
+
+class AnimationClock:
+	"""
+	One animation shared by every sprite that uses the same frames, speed and phase. Advanced once per frame
+	"""
+	def __init__(self, frames, speed = ANIMATION_SPEED, phase = 0):
+		self.frames = frames
+		self.len_frames = len(frames)
+		self.speed = speed
+		self.frame_index = phase % self.len_frames
+		self.index = int(self.frame_index)
+		self.image = self.frames[self.index]
+
+	def set_frame(self, frame_index):
+		self.frame_index = frame_index
+		self.index = int(self.frame_index)
+		self.image = self.frames[self.index]
+
+	def advance(self, dt):
+		# wraps with modulo, the index can never reach len_frames
+		self.frame_index = (self.frame_index + self.speed * dt / FPS_TARGET) % self.len_frames
+		self.index = int(self.frame_index)
+		self.image = self.frames[self.index]
+
+class AnimationClocks:
+	"""
+	registry of the clocks of a level, keyed by (frame list, speed, phase)
+	"""
+	def __init__(self):
+		self.clocks = {}
+		self.flipped_frames = {}
+
+	def get(self, frames, speed = ANIMATION_SPEED, phase = 0):
+		# the clock keeps the frame list alive, so its id can't be reused while the key exists
+		key = (id(frames), speed, phase)
+		clock = self.clocks.get(key)
+		if (clock is None):
+			clock = self.clocks[key] = AnimationClock(frames, speed, phase)
+		return clock
+
+	def flipped(self, frames, flip_x, flip_y):
+		"""
+		flipped copy of a frame list, built once and shared. Same length and order, so it can be indexed with the clock of frames
+		"""
+		key = (id(frames), flip_x, flip_y)
+		if (key not in self.flipped_frames):
+			# the source list is kept alive with it so its id can't be reused
+			self.flipped_frames[key] = (frames, [optimize_surface(pygame.transform.flip(frame, flip_x, flip_y)) for frame in frames])
+		return self.flipped_frames[key][1]
+
+	def save_state(self):
+		return tuple((key, clock.frame_index) for key, clock in self.clocks.items())
+
+	def load_state(self, state):
+		for key, frame_index in state:
+			self.clocks[key].set_frame(frame_index)
+
+	def update(self, dt):
+		for clock in self.clocks.values():
+			clock.advance(dt)
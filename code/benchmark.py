@@ -0,0 +1,136 @@
+"""
+Frame time against map size, on maps from level_generator. Run from the code folder:
+
+    python benchmark.py --widths 100 200 400 800 1600 --frames 300
+
+Prints build time, update and draw ms per frame for each width, and how fast the frame time grows with the width.
+A growth exponent near 0 means the per frame cost does not depend on the map size, near 1 means it is linear in it.
+Maps are built up front by default. With --chunked auto the narrow maps are built and the wide ones streamed like in the game,
+the exponents are then given for each mode on its own
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+
+# no window needed, set SDL_VIDEODRIVER to watch it
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from pytmx.util_pygame import load_pygame
+
+from settings import FPS_TARGET
+from support import optimize_tmx_images
+from events import EventBus
+from rendering import Renderer
+from level import Level
+from main import import_level_frames
+from level_generator import write_level
+
+class ScriptedKeys:
+    """
+    stands in for pygame.key.get_pressed(): hold right the whole run, jump every jump_interval frames
+    """
+    def __init__(self, jump_interval = 45):
+        self.frame = 0
+        self.jump_interval = jump_interval
+
+    def __getitem__(self, key):
+        if (key == pygame.K_d):
+            return True
+        if (key == pygame.K_SPACE):
+            return self.frame % self.jump_interval < 10
+        return False
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_width(width, frames, level_frames, events, renderer, chunked, seed, folder):
+    path = write_level(os.path.join(folder, f"bench_{width}.tmx"), width = width, seed = seed)
+
+    start = time.perf_counter()
+    tmx_map = optimize_tmx_images(load_pygame(path))
+    parsed = time.perf_counter()
+    level = Level([0, 0, tmx_map], level_frames, events, chunked = chunked)
+    renderer.attach(level)
+    built = time.perf_counter()
+
+    keys = ScriptedKeys()
+    events.input.keys = keys
+    update_times, draw_times = [], []
+    for frame in range(frames):
+        keys.frame = frame
+        start_update = time.perf_counter()
+        level.update(1)
+        start_draw = time.perf_counter()
+        level.draw()
+        end = time.perf_counter()
+        update_times.append((start_draw - start_update) * 1000)
+        draw_times.append((end - start_draw) * 1000)
+
+    level.close()
+    return {
+        "width": width,
+        "mode": "chunked" if (level.chunked) else "full",
+        "sprites": len(level.all_sprites),
+        "parse_ms": (parsed - start) * 1000,
+        "build_ms": (built - parsed) * 1000,
+        "update_ms": sum(update_times) / frames,
+        "update_p95": percentile(update_times, 0.95),
+        "draw_ms": sum(draw_times) / frames,
+        "draw_p95": percentile(draw_times, 0.95),
+        "player_x": level.player.hitbox_rect.x,
+    }
+
+def growth(results, key):
+    """
+    slope of log(time) against log(width) between the smallest and the largest map
+    """
+    first, last = results[0], results[-1]
+    if (first["width"] == last["width"] or first[key] <= 0 or last[key] <= 0):
+        return 0
+    return math.log(last[key] / first[key]) / math.log(last["width"] / first["width"])
+
+def main():
+    parser = argparse.ArgumentParser(description = "frame time against generated map size")
+    parser.add_argument("--widths", type = int, nargs = "+", default = [100, 200, 400, 800, 1600])
+    parser.add_argument("--frames", type = int, default = 300)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--chunked", choices = ("auto", "on", "off"), default = "off", help = "stream the maps in chunks, auto does what the game does for each width")
+    parser.add_argument("--csv", help = "also write the results to this file")
+    args = parser.parse_args()
+    chunked = {"auto": None, "on": True, "off": False}[args.chunked]
+
+    pygame.init()
+    renderer = Renderer()
+    events = EventBus()
+    level_frames = import_level_frames()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for width in sorted(args.widths):
+            results.append(run_width(width, args.frames, level_frames, events, renderer, chunked, args.seed, folder))
+
+    columns = ["width", "mode", "sprites", "parse_ms", "build_ms", "update_ms", "update_p95", "draw_ms", "draw_p95", "player_x"]
+    print(" ".join(f"{column:>11}" for column in columns))
+    for result in results:
+        print(" ".join(f"{result[column]:>11.3f}" if (isinstance(result[column], float)) else f"{result[column]:>11}" for column in columns))
+    # the two modes scale differently, an exponent across both would compare one against the other
+    for mode in ("full", "chunked"):
+        mode_results = [result for result in results if (result["mode"] == mode)]
+        if (len(mode_results) > 1):
+            print(f"growth exponent {mode}: update {growth(mode_results, 'update_ms'):.2f}, draw {growth(mode_results, 'draw_ms'):.2f}, build {growth(mode_results, 'build_ms'):.2f}")
+        elif (mode_results):
+            print(f"growth exponent {mode}: one width only")
+    print(f"frame budget {1000 / FPS_TARGET:.2f} ms")
+
+    if (args.csv):
+        with open(args.csv, "w") as file:
+            file.write(",".join(columns) + "\n")
+            for result in results:
+                file.write(",".join(str(result[column]) for column in columns) + "\n")
+
+if __name__ == "__main__":
+    main()
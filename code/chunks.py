@@ -0,0 +1,186 @@
+from settings import *
+
+
+class Chunk:
+    """
+    CHUNK_COLUMNS columns of the map. Tiles are built from the layer data when it loads and go back to the pool when it is evicted.
+    Objects are built the first time and parked out of their groups when evicted, so their state survives
+    """
+    def __init__(self, index):
+        self.index = index
+        # last chunk touched by one of its objects, wide objects keep their home chunk loaded
+        self.reach = index
+        self.objects = []   # (layer name, tmx object) not built yet
+        self.tiles = []
+        self.sprites = []   # built objects
+        self.built = False
+        self.resident = False
+
+class ChunkStreamer:
+    """
+    Loads the chunks around the player and evicts the ones far from it
+    """
+    def __init__(self, level):
+        self.level = level
+        self.tmx_map = level.tmx_map
+        self.chunk_width = CHUNK_COLUMNS * TILE_SIZE
+        self.chunks = [Chunk(index) for index in range(math.ceil(self.tmx_map.width / CHUNK_COLUMNS))]
+        self.resident_chunks = set()
+        self.tile_pool = []
+        self.max_reach = 0
+        self.loaded_range = None
+
+        self.tile_layers = [(layer, self.tmx_map.get_layer_by_name(layer)) for layer in TILE_LAYERS]
+
+        # bin the objects by the chunk they start in
+        for obj_layer in OBJECT_LAYERS:
+            for obj in self.tmx_map.get_layer_by_name(obj_layer):
+                self.place(obj_layer, obj)
+
+    def place(self, obj_layer, obj):
+        """
+        add the object to the chunk it starts in, and returns that chunk
+        """
+        last_chunk = len(self.chunks) - 1
+        # polyline points can go left of the object position
+        left, right = (min(point.x for point in obj.points), max(point.x for point in obj.points)) if hasattr(obj, "points") else (obj.x, obj.x + obj.width)
+        chunk = self.chunks[min(max(int(left // self.chunk_width), 0), last_chunk)]
+        chunk.objects.append((obj_layer, obj))
+        chunk.reach = max(chunk.reach, min(int(right // self.chunk_width), last_chunk))
+        self.max_reach = max(self.max_reach, chunk.reach - chunk.index)
+        return chunk
+
+    def set_map(self, tmx_map):
+        """
+        tiles are read from tmx_map from now on, chunks that load later get its changes without a reload
+        """
+        self.tmx_map = tmx_map
+        self.tile_layers = [(layer, tmx_map.get_layer_by_name(layer)) for layer in TILE_LAYERS]
+        while (len(self.chunks) < math.ceil(tmx_map.width / CHUNK_COLUMNS)):
+            self.chunks.append(Chunk(len(self.chunks)))
+        # chunk reaches can change, look at what is needed again on the next update
+        self.loaded_range = None
+
+    def reload_tile(self, layer, x, y):
+        """
+        rebuild one tile from the current map, only a resident chunk has it built
+        """
+        index = x // CHUNK_COLUMNS
+        if (index >= len(self.chunks) or not self.chunks[index].resident):
+            return
+        chunk = self.chunks[index]
+        level = self.level
+
+        sprite = level.tile_sprites.pop((layer, x, y), None)
+        if (sprite):
+            sprite.kill()
+            chunk.tiles.remove(sprite)
+            self.tile_pool.append(sprite)
+        surf = level.tile_surface(layer, x, y)
+        if (surf):
+            chunk.tiles.append(level.spawn_tile(layer, x, y, surf, self.tile_pool))
+
+    def remove_object(self, obj_id, sprites):
+        """
+        forget an object, sprites are the ones already built for it
+        """
+        for sprite in sprites:
+            sprite.chunk.sprites.remove(sprite)
+        for chunk in self.chunks:
+            chunk.objects = [(obj_layer, obj) for obj_layer, obj in chunk.objects if (obj.id != obj_id)]
+
+    def add_object(self, obj_layer, obj):
+        """
+        a new object goes with the others of its chunk, it is built now when the chunk already was
+        """
+        chunk = self.place(obj_layer, obj)
+        if (not chunk.built):
+            return
+        for sprite in self.level.spawn_object(obj_layer, obj):
+            sprite.chunk = chunk
+            chunk.sprites.append(sprite)
+            # parked until the chunk loads again
+            if (not chunk.resident):
+                sprite.kill()
+
+    def save_state(self):
+        return (tuple(chunk.index for chunk in self.resident_chunks), self.loaded_range)
+
+    def load_state(self, state):
+        indices, self.loaded_range = state
+        for chunk in [chunk for chunk in self.resident_chunks if chunk.index not in indices]:
+            self.evict(chunk)
+        for index in indices:
+            if (not self.chunks[index].resident):
+                self.load(self.chunks[index])
+
+    def chunk_range(self, left, right):
+        return int(left // self.chunk_width), int(right // self.chunk_width)
+
+    def needed(self, chunk, first, last):
+        return chunk.index <= last and chunk.reach >= first
+
+    def update(self, center_x):
+        # enemies keep moving up to the activity margin, they need the terrain there
+        half = WINDOW_WIDTH / 2 + ENEMY_ACTIVITY_MARGIN
+        first, last = self.chunk_range(center_x - half, center_x + half)
+        if ((first, last) == self.loaded_range):
+            return
+        self.loaded_range = (first, last)
+
+        for index in range(max(first - self.max_reach, 0), min(last, len(self.chunks) - 1) + 1):
+            chunk = self.chunks[index]
+            if (not chunk.resident and self.needed(chunk, first, last)):
+                self.load(chunk)
+
+        keep_first, keep_last = self.chunk_range(center_x - half - CHUNK_EVICT_DISTANCE, center_x + half + CHUNK_EVICT_DISTANCE)
+        for chunk in [chunk for chunk in self.resident_chunks if not self.needed(chunk, keep_first, keep_last)]:
+            self.evict(chunk)
+
+    def load(self, chunk):
+        level = self.level
+        first_col = chunk.index * CHUNK_COLUMNS
+        last_col = min(first_col + CHUNK_COLUMNS, self.tmx_map.width)
+
+        # tiles straight from the layer data, only for these columns
+        for layer, tmx_layer in self.tile_layers:
+            for y, row in enumerate(tmx_layer.data):
+                for x in range(first_col, last_col):
+                    gid = row[x]
+                    if (gid):
+                        chunk.tiles.append(level.spawn_tile(layer, x, y, self.tmx_map.images[gid], self.tile_pool))
+
+        if (not chunk.built):
+            for obj_layer, obj in chunk.objects:
+                for sprite in level.spawn_object(obj_layer, obj):
+                    sprite.chunk = chunk
+                    chunk.sprites.append(sprite)
+            chunk.built = True
+        else:
+            for sprite in chunk.sprites:
+                if (level.is_removed(sprite)):
+                    continue
+                sprite.add(sprite.home_groups)
+                if (hasattr(sprite, "think")):
+                    level.enemy_scheduler.add(sprite)
+
+        # the player updates after everything it can stand on, like when the level is built up front
+        if (hasattr(level, "player")):
+            level.player.remove(level.all_sprites)
+            level.player.add(level.all_sprites)
+
+        chunk.resident = True
+        self.resident_chunks.add(chunk)
+
+    def evict(self, chunk):
+        for sprite in chunk.tiles:
+            sprite.kill()
+            self.level.tile_sprites.pop((sprite.type, int(sprite.rect.x // TILE_SIZE), int(sprite.rect.y // TILE_SIZE)), None)
+            self.tile_pool.append(sprite)
+        chunk.tiles = []
+
+        for sprite in chunk.sprites:
+            sprite.kill()
+
+        chunk.resident = False
+        self.resident_chunks.discard(chunk)
@@ -1,10 +1,16 @@
 import pygame
-pygame.init()
-font = pygame.font.Font(None, 30)
+
+# made on the first call, so importing this doesn't initialize the font module
+font = None
 
 def debug(info, y = 10, x = 10):
+	global font
+	if (font is None):
+		pygame.font.init()
+		font = pygame.font.Font(None, 30)
+
 	display_surface = pygame.display.get_surface()
 	debug_surf = font.render(f"{info}", True, 'White')
 	debug_rect = debug_surf.get_rect(topleft = (x, y))
 	pygame.draw.rect(display_surface, 'Black', debug_rect)
-	display_surface.blit(debug_surf, debug_rect)
\ No newline at end of file
+	display_surface.blit(debug_surf, debug_rect)
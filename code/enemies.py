@@ -0,0 +1,238 @@
+from settings import *
+from support import optimize_surface
+from sprites import AnimatedSprite
+from timerClass import Timer
+
+
+class Enemy(AnimatedSprite):
+	"""
+	Base enemy. The AI is ticked by the EnemyScheduler, not by AllSprites.update
+	"""
+	def __init__(self, pos, frames, groups, terrain_sprites, speed = 0, health = ENEMY_HEALTH, type = ENEMY_OBJECTS, z = Z_LAYERS["main"], clocks = None):
+
+		self.facing_right = False
+		super().__init__(pos, frames, groups, type, z, clocks = clocks)
+
+		# frames face left, keep a flipped copy instead of flipping every frame
+		self.right_frames = clocks.flipped(frames, True, False) if clocks else [optimize_surface(pygame.transform.flip(frame, True, False)) for frame in frames]
+
+		# collision index groups (basic, semi, ramps)
+		self.terrain_sprites = terrain_sprites
+		self.home = vector(self.rect.center)
+		self.speed = speed
+		self.health = health
+
+		# dt skipped while on the reduced rate tier
+		self.pending_dt = 0
+		self.frames_since_tick = 0
+
+	def save_state(self):
+		return (tuple(self.rect), tuple(self.old_rect), self.facing_right, self.health, self.pending_dt, self.frames_since_tick)
+
+	def load_state(self, state):
+		rect, old_rect, self.facing_right, self.health, self.pending_dt, self.frames_since_tick = state
+		self.rect.update(rect)
+		self.old_rect.update(old_rect)
+
+	def touches_terrain(self, rect):
+		for group in self.terrain_sprites:
+			if (group.collides(rect)):
+				return True
+		return False
+
+	def hit(self, damage = 1):
+		self.health -= damage
+		if (self.health <= 0):
+			self.kill()
+
+	@property
+	def image(self):
+		if (self.facing_right):
+			return self.right_frames[self.clock.index]
+		return self.clock.image
+
+	@image.setter
+	def image(self, surf):
+		pass
+
+	def think(self, dt, player):
+		pass
+
+	def tick(self, dt, player):
+		self.old_rect = self.rect.copy()
+		self.think(dt, player)
+		if (self.own_clock):
+			self.clock.advance(dt)
+
+	def update(self, dt):
+		# driven by the EnemyScheduler
+		pass
+
+class PatrolEnemy(Enemy):
+	"""
+	Walks back and forth on the ground, turns around at walls and ledges
+	"""
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.direction = -1
+		self.velocity_y = 0
+		self.on_ground = False
+
+	def save_state(self):
+		return (super().save_state(), self.direction, self.velocity_y, self.on_ground)
+
+	def load_state(self, state):
+		base, self.direction, self.velocity_y, self.on_ground = state
+		super().load_state(base)
+
+	def fall(self, dt):
+		self.velocity_y = min(self.velocity_y + GRAVITY_NORM * dt, PLAYER_MAX_VEL_Y)
+		self.rect.y += self.velocity_y * dt
+
+		self.on_ground = False
+		for group in self.terrain_sprites:
+			for sprite in group.candidates(self.rect):
+				if (sprite.rect.colliderect(self.rect) and self.old_rect.bottom <= sprite.rect.top + 1):
+					# landed, approached from the top
+					self.rect.bottom = sprite.rect.top
+					self.velocity_y = 0
+					self.on_ground = True
+
+	def think(self, dt, player):
+		self.fall(dt)
+		if (not self.on_ground):
+			return
+
+		self.rect.x += self.direction * self.speed * dt
+
+		# 1 pixel probes in front of the enemy, one for walls and one for the floor
+		front_x = self.rect.right if self.direction > 0 else self.rect.left - 1
+		wall_rect = pygame.FRect(front_x, self.rect.top, 1, self.rect.height - 2)
+		floor_rect = pygame.FRect(front_x, self.rect.bottom, 1, 2)
+		if (self.touches_terrain(wall_rect) or not self.touches_terrain(floor_rect)):
+			self.rect.x = self.old_rect.x
+			self.direction = -self.direction
+
+		self.facing_right = self.direction > 0
+
+class ChaseEnemy(Enemy):
+	"""
+	Flies towards the player when in range, otherwise returns to where it was placed
+	"""
+	def think(self, dt, player):
+		center = vector(self.rect.center)
+		to_player = vector(player.hitbox_rect.center) - center
+		target = to_player if (to_player.length() < ENEMY_CHASE_RADIUS) else self.home - center
+		if (target.length() < 1):
+			return
+		direction = target.normalize()
+
+		# per axis so it slides along terrain instead of sticking to it
+		self.rect.x += direction.x * self.speed * dt
+		if (self.touches_terrain(self.rect)):
+			self.rect.x = self.old_rect.x
+		self.rect.y += direction.y * self.speed * dt
+		if (self.touches_terrain(self.rect)):
+			self.rect.y = self.old_rect.y
+
+		self.facing_right = direction.x > 0
+
+class ShootEnemy(Enemy):
+	"""
+	Stays in place and fires at the player when in range
+	"""
+	def __init__(self, *args, shoot = None, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.shoot = shoot
+		self.cooldown = Timer(ENEMY_SHOOT_COOLDOWN)
+
+	def save_state(self):
+		return (super().save_state(), self.cooldown.save_state())
+
+	def load_state(self, state):
+		base, cooldown = state
+		super().load_state(base)
+		self.cooldown.load_state(cooldown)
+
+	def think(self, dt, player):
+		self.cooldown.update()
+
+		to_player = vector(player.hitbox_rect.center) - vector(self.rect.center)
+		self.facing_right = to_player.x > 0
+		if (self.shoot and not self.cooldown.active and 0 < to_player.length() < ENEMY_SHOOT_RANGE):
+			# volley fanned out around the direction of the player
+			direction = to_player.normalize().rotate(-ENEMY_SHOT_ANGLE * (ENEMY_SHOT_SPREAD - 1) / 2)
+			for _ in range(ENEMY_SHOT_SPREAD):
+				self.shoot(self.rect.center, direction)
+				direction = direction.rotate(ENEMY_SHOT_ANGLE)
+			self.cooldown.activate()
+
+ENEMY_CLASSES = {
+	"patrol": PatrolEnemy,
+	"chase": ChaseEnemy,
+	"shoot": ShootEnemy
+}
+
+class EnemyScheduler:
+	"""
+	Ticks the enemy AI on a budget.
+	Near the view: every frame. Off-screen within the activity margin: every ENEMY_REDUCED_INTERVAL frames, at most ENEMY_AI_BUDGET per frame. Further out: frozen
+	"""
+	def __init__(self):
+		self.enemies = []
+		# round robin position in the reduced tier so every enemy gets its turn
+		self.cursor = 0
+
+	def add(self, enemy):
+		# enemies can be parked and brought back before the schedule drops them
+		if (enemy not in self.enemies):
+			self.enemies.append(enemy)
+
+	def discard(self, enemies):
+		# taken out of the level for good, not just killed
+		self.enemies = [enemy for enemy in self.enemies if (enemy not in enemies)]
+
+	def save_state(self):
+		# enemies by their index in the level snapshot
+		return (self.cursor, tuple(enemy.state_index for enemy in self.enemies))
+
+	def load_state(self, state, stateful_sprites):
+		self.cursor, indices = state
+		self.enemies = [stateful_sprites[index] for index in indices]
+
+	def update(self, dt, view_rect, player):
+		full_rect = view_rect.inflate(ENEMY_FULL_RATE_MARGIN * 2, ENEMY_FULL_RATE_MARGIN * 2)
+		active_rect = view_rect.inflate(ENEMY_ACTIVITY_MARGIN * 2, ENEMY_ACTIVITY_MARGIN * 2)
+
+		reduced = []
+		dead = False
+		for enemy in self.enemies:
+			if (not enemy.alive()):
+				dead = True
+			elif (full_rect.colliderect(enemy.rect)):
+				enemy.tick(dt + enemy.pending_dt, player)
+				enemy.pending_dt = 0
+				enemy.frames_since_tick = 0
+			elif (active_rect.colliderect(enemy.rect)):
+				enemy.pending_dt = min(enemy.pending_dt + dt, ENEMY_REDUCED_INTERVAL * 2)
+				enemy.frames_since_tick += 1
+				reduced.append(enemy)
+			else:
+				# frozen, drop the time so it doesn't jump when it wakes up
+				enemy.pending_dt = 0
+
+		budget = ENEMY_AI_BUDGET
+		for i in range(len(reduced)):
+			if (budget <= 0):
+				break
+			enemy = reduced[(self.cursor + i) % len(reduced)]
+			if (enemy.frames_since_tick >= ENEMY_REDUCED_INTERVAL):
+				enemy.tick(enemy.pending_dt, player)
+				enemy.pending_dt = 0
+				enemy.frames_since_tick = 0
+				budget -= 1
+		self.cursor += ENEMY_AI_BUDGET - budget
+
+		if (dead):
+			# killed enemies leave the schedule
+			self.enemies = [enemy for enemy in self.enemies if enemy.alive()]
@@ -0,0 +1,62 @@
+from settings import *
+
+# level events, sent through the bus with emit
+ITEM_COLLECTED = pygame.event.custom_type()
+PLAYER_HIT = pygame.event.custom_type()
+
+class InputSnapshot:
+    """
+    keyboard and mouse state, sampled once per frame
+    """
+    def __init__(self):
+        self.sample()
+
+    def sample(self):
+        # perf_counter_ns of the sample, for the input to present latency
+        self.sampled_at = time.perf_counter_ns()
+        self.keys = pygame.key.get_pressed()
+        self.mouse_pos = pygame.mouse.get_pos()
+        self.mouse_buttons = pygame.mouse.get_pressed()
+
+class EventBus:
+    """
+    Systems subscribe to the event types they care about. Each frame pump() takes the pygame events off the queue,
+    calls only the subscribers of each type and samples the input snapshot
+    """
+    def __init__(self):
+        self.handlers = {}
+        self.input = InputSnapshot()
+
+    def subscribe(self, event_type, handler):
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        handlers = self.handlers.get(event_type)
+        if (handlers and handler in handlers):
+            handlers.remove(handler)
+
+    def unsubscribe_object(self, obj):
+        """
+        drop every handler that is a method of obj
+        """
+        for handlers in self.handlers.values():
+            handlers[:] = [handler for handler in handlers if getattr(handler, "__self__", None) is not obj]
+
+    def dispatch(self, event):
+        handlers = self.handlers.get(event.type)
+        if (handlers):
+            # copy, a handler may unsubscribe
+            for handler in list(handlers):
+                handler(event)
+
+    def emit(self, event_type, **attributes):
+        """
+        send a custom event to its subscribers right away
+        """
+        if (event_type in self.handlers):
+            self.dispatch(pygame.event.Event(event_type, attributes))
+
+    def pump(self):
+        for event in pygame.event.get():
+            self.dispatch(event)
+        self.input.sample()
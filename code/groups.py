@@ -1,20 +1,158 @@
 from settings import *
+from support import scale_surface
 
 # group to sim camera, override Group class
 class AllSprites(pygame.sprite.Group):
 
     def __init__(self):
         super().__init__()
-        self.display_surface = pygame.display.get_surface()
         self.offset = vector(0, 0)
+        # internal render resolution relative to the window, images are scaled once per scale and kept
+        self.scale = 1
+        self.scaled_images = {}
+        self.scale_cache = {}
 
-    def draw(self, target_pos, player_width, tmx_map_width):
+    def view_rect(self):
+        """
+        area of the level that was on screen in the last draw
+        """
+        return pygame.FRect(-self.offset.x, -self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.scaled_images = self.scale_cache.setdefault(scale, {})
+
+    def scaled(self, surf):
+        image = self.scaled_images.get(surf)
+        if (image is None):
+            image = self.scaled_images[surf] = scale_surface(surf, self.scale)
+        return image
+
+    def update_camera(self, target_pos, player_width, tmx_map_width):
         self.offset.x = -(target_pos[0] - (WINDOW_WIDTH / 2) + player_width)
 
         # bounds
         self.offset.x = max(min(self.offset.x, 0), -((tmx_map_width - 2) * TILE_SIZE - WINDOW_WIDTH + player_width))
 
+    def render_list(self):
+        """
+        (image, screen position) of every visible sprite in draw order, at the current scale
+        """
+        blits = []
+        offset_x, offset_y = self.offset
+        scale = self.scale
         for sprite in sorted(self, key = lambda sprite : sprite.z):
-            offset_pos = sprite.rect.topleft + self.offset
-            # get all sprites in this group
-            self.display_surface.blit(sprite.image, offset_pos)
\ No newline at end of file
+            if (not sprite.visible):
+                continue
+            x, y = sprite.rect.topleft
+            if (scale == 1):
+                blits.append((sprite.image, (x + offset_x, y + offset_y)))
+            else:
+                # rounded after scaling, so tiles on the grid stay whole pixels apart and leave no seams
+                blits.append((self.scaled(sprite.image), (round((x + offset_x) * scale), round((y + offset_y) * scale))))
+        return blits
+
+class IndexedRect(pygame.FRect):
+    """
+    rect of a static sprite bucketed in a SpatialGroup. Moving it would leave the grid cells stale, so it can't be changed.
+    Rects made from it, like copy() or move(), are plain FRects
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"rect of an indexed static sprite can't be moved, set {name} before it joins a SpatialGroup")
+
+    def frozen(self, *args, **kwargs):
+        raise AttributeError("rect of an indexed static sprite can't be moved, change it before it joins a SpatialGroup")
+
+    move_ip = inflate_ip = scale_by_ip = clamp_ip = union_ip = unionall_ip = normalize = update = frozen
+
+for name in ("copy", "move", "move_to", "inflate", "scale_by", "clamp", "clip", "fit", "union", "unionall"):
+    # bound to the FRect method through a default argument, each wrapper returns a plain FRect
+    setattr(IndexedRect, name, lambda self, *args, method = getattr(pygame.FRect, name), **kwargs: pygame.FRect(method(self, *args, **kwargs)))
+
+# collision index, shared by the player and the enemies
+class SpatialGroup(pygame.sprite.Group):
+    """
+    Group that also buckets its sprites into a uniform grid so rect queries only look at the nearby cells.
+    Sprites with a "moving" attribute change rect every frame, so they are kept in a separate list and always returned.
+    The others get an IndexedRect when they are bucketed, so they can't move away from their cells
+    """
+
+    def __init__(self, *sprites, cell_size = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.sprite_cells = {}
+        self.dynamic_sprites = {}
+        # insertion order, so queries return sprites in the same order as iterating the group
+        self.order = {}
+        self.counter = 0
+        super().__init__(*sprites)
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return range(int(rect.left // size), int(rect.right // size) + 1), range(int(rect.top // size), int(rect.bottom // size) + 1)
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self.counter
+        self.counter += 1
+
+        if (hasattr(sprite, "moving")):
+            self.dynamic_sprites[sprite] = None
+            return
+
+        if (type(sprite.rect) is not IndexedRect):
+            sprite.rect = IndexedRect(sprite.rect)
+        cells = []
+        cols, rows = self.cell_range(sprite.rect)
+        for col in cols:
+            for row in rows:
+                self.cells.setdefault((col, row), []).append(sprite)
+                cells.append((col, row))
+        self.sprite_cells[sprite] = cells
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.order[sprite]
+
+        if (sprite in self.dynamic_sprites):
+            del self.dynamic_sprites[sprite]
+            return
+
+        for cell in self.sprite_cells.pop(sprite):
+            bucket = self.cells[cell]
+            bucket.remove(sprite)
+            if (not bucket):
+                del self.cells[cell]
+
+    def candidates(self, rect):
+        found = set(self.dynamic_sprites)
+        cols, rows = self.cell_range(rect)
+        for col in cols:
+            for row in rows:
+                bucket = self.cells.get((col, row))
+                if (bucket):
+                    found.update(bucket)
+        return found
+
+    def sprites_in(self, rect):
+        """
+        returns the sprites that may touch rect, in group order. Callers still do the exact rect test
+        """
+        return sorted(self.candidates(rect), key = self.order.__getitem__)
+
+    def collides(self, rect):
+        # walks the cells directly, called for every projectile so it builds no set
+        for sprite in self.dynamic_sprites:
+            if (sprite.rect.colliderect(rect)):
+                return True
+        cols, rows = self.cell_range(rect)
+        for col in cols:
+            for row in rows:
+                bucket = self.cells.get((col, row))
+                if (bucket):
+                    for sprite in bucket:
+                        if (sprite.rect.colliderect(rect)):
+                            return True
+        return False
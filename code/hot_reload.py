@@ -0,0 +1,83 @@
+import os
+
+from settings import *
+
+class MapWatcher:
+	"""
+	Polls the modification time of a map file, at most every interval ms
+	"""
+	def __init__(self, path, interval = HOT_RELOAD_INTERVAL):
+		self.path = path
+		self.interval = interval
+		self.mtime = self.modified()
+		self.next_check = time.perf_counter() + interval / 1000
+
+	def modified(self):
+		try:
+			return os.stat(self.path).st_mtime_ns
+		except OSError:
+			# editors can remove the file for a moment while saving
+			return None
+
+	def changed(self):
+		now = time.perf_counter()
+		if (now < self.next_check):
+			return False
+		self.next_check = now + self.interval / 1000
+
+		mtime = self.modified()
+		if (mtime is None or mtime == self.mtime):
+			return False
+		self.mtime = mtime
+		return True
+
+def tile_keys(tmx_map):
+	"""
+	(Tiled gid, flags) of every gid pytmx gave out. pytmx numbers tiles in the order it meets them, so gids of two loads of a map can only be compared through these
+	"""
+	keys = {0: None}
+	for key, value in tmx_map.imagemap.items():
+		if (isinstance(value, tuple)):
+			keys[value[0]] = key
+	return keys
+
+def changed_tiles(old_map, new_map):
+	"""
+	(layer, x, y) of every cell of the tile layers that is different in new_map, cells outside one of the maps count as empty there
+	"""
+	old_keys, new_keys = tile_keys(old_map), tile_keys(new_map)
+	width = max(old_map.width, new_map.width)
+	height = max(old_map.height, new_map.height)
+	empty = [None] * width
+
+	changed = []
+	for layer in TILE_LAYERS:
+		old_data = old_map.get_layer_by_name(layer).data
+		new_data = new_map.get_layer_by_name(layer).data
+		for y in range(height):
+			old_row = [old_keys[gid] for gid in old_data[y]] + empty[old_map.width:] if (y < len(old_data)) else empty
+			new_row = [new_keys[gid] for gid in new_data[y]] + empty[new_map.width:] if (y < len(new_data)) else empty
+			if (old_row != new_row):
+				changed.extend((layer, x, y) for x in range(width) if (old_row[x] != new_row[x]))
+	return changed
+
+def object_signature(obj, layer, keys):
+	points = tuple((point.x, point.y) for point in obj.points) if (hasattr(obj, "points")) else None
+	return (layer, obj.name, obj.x, obj.y, obj.width, obj.height, obj.rotation, keys.get(obj.gid),
+		sorted(obj.properties.items()), points, getattr(obj, "closed", None))
+
+def object_signatures(tmx_map):
+	keys = tile_keys(tmx_map)
+	return {obj.id: (object_signature(obj, layer, keys), layer, obj) for layer in OBJECT_LAYERS for obj in tmx_map.get_layer_by_name(layer)}
+
+def changed_objects(old_map, new_map):
+	"""
+	ids of the objects that are gone or different in new_map, and (layer, object) of the ones that are new or different.
+	Objects are matched by their Tiled id, a changed object is in both
+	"""
+	old_objects = object_signatures(old_map)
+	new_objects = object_signatures(new_map)
+
+	removed = [obj_id for obj_id, (signature, _, _) in old_objects.items() if (obj_id not in new_objects or new_objects[obj_id][0] != signature)]
+	added = [(layer, obj) for obj_id, (signature, layer, obj) in new_objects.items() if (obj_id not in old_objects or old_objects[obj_id][0] != signature)]
+	return removed, added
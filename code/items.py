@@ -0,0 +1,16 @@
+from settings import *
+from sprites import AnimatedSprite
+
+
+class Item(AnimatedSprite):
+	"""
+	Collectible. The frame comes from the shared clock, the item itself does no work per frame
+	"""
+	def __init__(self, pos, frames, name, obj_id, groups, z = Z_LAYERS["main"], clocks = None):
+
+		super().__init__(pos, frames, groups, ITEM_OBJECTS, z, clocks = clocks, anchor = "center")
+
+		self.name = name
+		self.obj_id = obj_id
+		self.value = ITEM_VALUES.get(name, 1)
+
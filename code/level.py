@@ -2,12 +2,21 @@ from random import uniform
 
 from settings import *
 from sprites import Sprite, AnimatedSprite, MovingSprite, Orbit
+from enemies import ENEMY_CLASSES, EnemyScheduler
+from items import Item
+from animation import AnimationClocks
+from projectiles import ProjectilePool, ENEMY_OWNER, ENEMY_BALL
 from player import Player
-from groups import AllSprites
+from groups import AllSprites, SpatialGroup
+from chunks import ChunkStreamer
+from paths import tmx_path
+from support import optimize_surface
+from events import ITEM_COLLECTED
+from hot_reload import changed_tiles, changed_objects
 
 class Level:
 
-    def __init__(self, level_data, level_frames):
+    def __init__(self, level_data, level_frames, events, chunked = None):
 
         self.display_surface = pygame.display.get_surface()
 
@@ -16,14 +25,38 @@ class Level:
         self.tmx_map = level_data[2]
 
         self.tmx_map_max_width = self.tmx_map.width
+        self.events = events
+        # wide maps are streamed in column chunks around the camera instead of built up front
+        self.chunked = (self.tmx_map.width >= CHUNKED_MIN_WIDTH) if (chunked is None) else chunked
 
         # sprite groups
         self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
-        self.ramp_collision_sprites = pygame.sprite.Group()
-        self.semi_collision_sprites = pygame.sprite.Group()
+        # collision groups are also the collision index, queried by the player and the enemies
+        self.collision_sprites = SpatialGroup()
+        self.ramp_collision_sprites = SpatialGroup()
+        self.semi_collision_sprites = SpatialGroup()
         # self.masked_sprites = pygame.sprite.Group()
         self.damage_sprites = pygame.sprite.Group()
+        # items don't move, so the index only ever changes when one is collected
+        self.item_sprites = SpatialGroup()
+
+        self.animation_clocks = AnimationClocks()
+        self.collected_items = set()
+        self.score = 0
+        # sprites with state that changes while playing, in the order they were built. Snapshots follow this order
+        self.stateful_sprites = []
+        # built sprites by tile cell and by object id, what a map reload replaces
+        self.tile_sprites = {}
+        self.object_sprites = {}
+        # number of map reloads, snapshots from before one don't line up with the stateful sprites
+        self.revision = 0
+
+        self.enemy_scheduler = EnemyScheduler()
+        # surfaces by projectile kind: enemy ball, player ball, attack hitbox
+        self.projectiles = ProjectilePool(
+            surfaces = (level_frames["projectile"], level_frames["player_ball"], None),
+            collision_sprites = self.collision_sprites,
+            damage_sprites = self.damage_sprites)
 
         self.setup(level_frames)
 
@@ -31,54 +64,129 @@ class Level:
         """
         get the layers and objects from the tmx_map and store them in the correct list
         """
-        # layers
-        for layer in [BG, TERRAIN_BASIC, TERRAIN_R_RAMP, TERRAIN_L_RAMP, TERRAIN_FLOOR_ONLY, PLATFORMS_PARTIAL, FG]:
-            for x, y, surf in self.tmx_map.get_layer_by_name(layer).tiles():
-                groups = [self.all_sprites]
-                if (layer == BG):
-                    z = Z_LAYERS["bg"]
-                elif (layer in [TERRAIN_BASIC]): 
-                    z = Z_LAYERS["terrain"]
-                    groups.append(self.collision_sprites)
-                elif (layer in [TERRAIN_R_RAMP, TERRAIN_L_RAMP]):
-                    z = Z_LAYERS["terrain"]
-                    groups.append(self.ramp_collision_sprites)
-                # elif (layer in [PLATFORMS_PARTIAL]):
-                #     z = Z_LAYERS["terrain"]
-                #     groups.append(self.masked_sprites)
-                elif (layer in [TERRAIN_FLOOR_ONLY]):
-                    z = Z_LAYERS["terrain"]
-                    groups.append(self.semi_collision_sprites)
-                elif (layer in [FG]):
-                    z = Z_LAYERS["fg"]
+        self.level_frames = level_frames
 
-                Sprite(
-                    pos = (x * TILE_SIZE, y * TILE_SIZE), 
-                    surf = surf, 
-                    groups = groups, 
-                    type = layer, 
-                    z = z)
+        if (self.chunked):
+            # tiles and objects are built by the streamer when the camera gets close
+            self.chunk_streamer = ChunkStreamer(self)
+        else:
+            self.chunk_streamer = None
+
+            # layers
+            for layer in TILE_LAYERS:
+                for x, y, surf in self.tmx_map.get_layer_by_name(layer).tiles():
+                    self.spawn_tile(layer, x, y, surf)
+
+            # objects
+            for obj_layer in OBJECT_LAYERS:
+                for obj in self.tmx_map.get_layer_by_name(obj_layer):
+                    self.spawn_object(obj_layer, obj)
+
+        # player objects
+        for obj in self.tmx_map.get_layer_by_name(PLAYER_OBJECTS):
+            if (obj.name == "player"):
+                #self.player = Player((obj.x, obj.y), (obj.width, obj.height), self.all_sprites, self.collision_sprites, self.semi_collision_sprites, self.ramp_collision_sprites, None)
+                self.player = Player(
+                                pos = (obj.x, obj.y), 
+                                surf = obj.image, 
+                                groups = self.all_sprites, 
+                                collision_sprites = self.collision_sprites, 
+                                semi_collision_sprites = self.semi_collision_sprites, 
+                                ramp_collision_sprites = self.ramp_collision_sprites,
+                                projectiles = self.projectiles,
+                                events = self.events,
+                                frames = None)
+
+        if (self.chunk_streamer):
+            self.chunk_streamer.update(self.player.hitbox_rect.centerx)
+
+        # water
+
+        # triggers
+
+    def spawn_tile(self, layer, x, y, surf, pool = None):
+        """
+        returns the sprite for the tile at column x, row y of a tile layer. Reuses a sprite from pool if one is given and not empty
+        """
+        groups = [self.all_sprites]
+        if (layer == BG):
+            z = Z_LAYERS["bg"]
+        elif (layer in [TERRAIN_BASIC]): 
+            z = Z_LAYERS["terrain"]
+            groups.append(self.collision_sprites)
+        elif (layer in [TERRAIN_R_RAMP, TERRAIN_L_RAMP]):
+            z = Z_LAYERS["terrain"]
+            groups.append(self.ramp_collision_sprites)
+        # elif (layer in [PLATFORMS_PARTIAL]):
+        #     z = Z_LAYERS["terrain"]
+        #     groups.append(self.masked_sprites)
+        elif (layer in [TERRAIN_FLOOR_ONLY]):
+            z = Z_LAYERS["terrain"]
+            groups.append(self.semi_collision_sprites)
+        elif (layer in [FG]):
+            z = Z_LAYERS["fg"]
+        else:
+            z = Z_LAYERS["terrain"]
 
-        # objects
-        for obj_layer in [BG_DETAILS, MID_DETAILS]:
-            for obj in self.tmx_map.get_layer_by_name(obj_layer):
+        if (pool):
+            sprite = pool.pop()
+            sprite.reset((x * TILE_SIZE, y * TILE_SIZE), surf, groups, layer, z)
+        else:
+            sprite = Sprite(
+                pos = (x * TILE_SIZE, y * TILE_SIZE), 
+                surf = surf, 
+                groups = groups, 
+                type = layer, 
+                z = z)
+        self.tile_sprites[(layer, x, y)] = sprite
+        return sprite
+
+    def tile_surface(self, layer, x, y):
+        """
+        image of the tile at column x, row y of a tile layer, None for an empty cell or one outside the map
+        """
+        if (x >= self.tmx_map.width or y >= self.tmx_map.height):
+            return None
+        gid = self.tmx_map.get_layer_by_name(layer).data[y][x]
+        return self.tmx_map.images[gid] if (gid) else None
+
+    def spawn_object(self, obj_layer, obj):
+        """
+        build the sprites of one object of an object layer, returns them as a list
+        """
+        sprites = self.build_object(obj_layer, obj)
+        for sprite in sprites:
+            # groups to go back to when parked by the chunk streamer or brought back by restore
+            sprite.home_groups = tuple(sprite.groups())
+            if (hasattr(sprite, "save_state") or hasattr(sprite, "obj_id")):
+                sprite.state_index = len(self.stateful_sprites)
+                # restore puts sprites built after a snapshot back to this, as if they were never built
+                sprite.spawn_state = sprite.save_state() if hasattr(sprite, "save_state") else None
+                self.stateful_sprites.append(sprite)
+        self.object_sprites[obj.id] = sprites
+        return sprites
+
+    def build_object(self, obj_layer, obj):
+        level_frames = self.level_frames
+
+        if (obj_layer in [BG_DETAILS, MID_DETAILS]):
+            z = Z_LAYERS["bg_details"]
+            if (obj_layer == BG_DETAILS):
                 z = Z_LAYERS["bg_details"]
-                if (obj_layer == BG_DETAILS):
-                    z = Z_LAYERS["bg_details"]
-                elif (obj_layer == MID_DETAILS):
-                    z = Z_LAYERS["mid_details"]
+            elif (obj_layer == MID_DETAILS):
+                z = Z_LAYERS["mid_details"]
+
+            return [Sprite(
+                pos = (obj.x, obj.y), 
+                surf = obj.image, 
+                groups = self.all_sprites, 
+                type = obj_layer, 
+                z = z)]
 
-                Sprite(
-                    pos = (obj.x, obj.y), 
-                    surf = obj.image, 
-                    groups = self.all_sprites, 
-                    type = obj_layer, 
-                    z = z)
-                
         # moving objects
-        for obj in self.tmx_map.get_layer_by_name(MOVING_OBJECTS):
+        if (obj_layer == MOVING_OBJECTS):
             if (obj.name == "bats"):
-                Orbit(
+                return [Orbit(
 					pos = (obj.x + obj.width / 2, obj.y + obj.height / 2),
 					frames = level_frames["bats"],
 					radius = obj.properties["radius"],
@@ -86,10 +194,17 @@ class Level:
 					start_angle = obj.properties["start_angle"],
 					end_angle = obj.properties["end_angle"],
                     groups = (self.all_sprites, self.damage_sprites),
-                    type = MOVING_OBJECTS)
+                    type = MOVING_OBJECTS,
+                    clocks = self.animation_clocks)]
 
             elif (obj.name in ("platform", "boat")):
-                if (obj.width > obj.height):
+                path = None
+                if (hasattr(obj, "points")):
+                    # polyline or polygon, followed point to point
+                    path = tmx_path(obj)
+                    path_plane = path.plane
+                    start_pos, end_pos = path.points[0], path.points[-1]
+                elif (obj.width > obj.height):
                     # horizontal path
                     path_plane = "x"
                     start_pos = (obj.x, obj.y + (obj.height / 2))
@@ -111,7 +226,7 @@ class Level:
                     groups.append(self.semi_collision_sprites)
                 groups = tuple(groups)
 
-                MovingSprite(
+                return [MovingSprite(
                     frames = level_frames[obj.name], 
                     start_pos = start_pos, 
                     end_pos = end_pos, 
@@ -122,34 +237,38 @@ class Level:
                     flip = flip, 
                     groups = groups,
                     type = MOVING_OBJECTS, 
-                    z = Z_LAYERS["main"])
+                    z = Z_LAYERS["main"],
+                    clocks = self.animation_clocks,
+                    path = path)]
+            return []
 
         # general objects
-        for obj in self.tmx_map.get_layer_by_name(GENERAL_OBJECTS):
+        if (obj_layer == GENERAL_OBJECTS):
             if (obj.name == "invis_wall"):
                 image = pygame.Surface([obj.width,obj.height], pygame.SRCALPHA, 32)
-                image = image.convert_alpha()
-                Sprite(
+                image = optimize_surface(image.convert_alpha())
+                return [Sprite(
                     pos = (obj.x, obj.y), 
                     surf = image, 
                     groups = (self.all_sprites, self.collision_sprites), 
                     type = GENERAL_OBJECTS, 
-                    z = Z_LAYERS["invis"])
+                    z = Z_LAYERS["invis"])]
             elif ("ROCK" in str.upper(obj.name)):
                 # non-animated
-                Sprite(
+                return [Sprite(
                     pos = (obj.x, obj.y), 
                     surf = obj.image, 
                     groups = (self.all_sprites, self.collision_sprites), 
                     type = GENERAL_OBJECTS, 
-                    z = Z_LAYERS["main"])
+                    z = Z_LAYERS["main"])]
             else:
                 # animated
                 # frames 
                 # thorns and floor spikes
                 frames = level_frames[obj.name]
                 if obj.name == "floor_spikes" and obj.properties["inverted"]:
-                    frames = [pygame.transform.flip(frame, False, True) for frame in frames]
+                    # shared flipped copy, so all inverted spikes run on one clock
+                    frames = self.animation_clocks.flipped(frames, False, True)
 
                 # groups 
                 groups = [self.all_sprites]
@@ -159,42 +278,227 @@ class Level:
                 # z index
                 z = Z_LAYERS["main"] if not "bg" in obj.name else Z_LAYERS["bg_details"]
 
-                AnimatedSprite(
+                return [AnimatedSprite(
                     pos = (obj.x, obj.y), 
                     frames = frames, 
                     groups = groups, 
                     type = GENERAL_OBJECTS, 
                     z = z,
-                    animation_speed = ANIMATION_SPEED)
+                    animation_speed = ANIMATION_SPEED,
+                    clocks = self.animation_clocks)]
 
-        for obj in self.tmx_map.get_layer_by_name(ENEMY_OBJECTS):
-            pass
+        # enemies
+        if (obj_layer == ENEMY_OBJECTS):
+            behaviour = obj.properties.get("behaviour", ENEMY_BEHAVIOURS.get(obj.name))
+            if (behaviour is None or obj.name not in level_frames):
+                # no AI or graphics for it yet, like the boss signs
+                return []
+
+            extra = {"shoot": self.create_projectile} if (behaviour == "shoot") else {}
+            enemy = ENEMY_CLASSES[behaviour](
+                pos = (obj.x, obj.y),
+                frames = level_frames[obj.name],
+                groups = (self.all_sprites, self.damage_sprites),
+                terrain_sprites = (self.collision_sprites, self.semi_collision_sprites, self.ramp_collision_sprites),
+                speed = obj.properties.get("speed", ENEMY_SPEED[behaviour]),
+                clocks = self.animation_clocks,
+                **extra)
+            self.enemy_scheduler.add(enemy)
+            return [enemy]
 
-        # player objects
-        for obj in self.tmx_map.get_layer_by_name(PLAYER_OBJECTS):
-            if (obj.name == "player"):
-                #self.player = Player((obj.x, obj.y), (obj.width, obj.height), self.all_sprites, self.collision_sprites, self.semi_collision_sprites, self.ramp_collision_sprites, None)
-                self.player = Player(
-                                pos = (obj.x, obj.y), 
-                                surf = obj.image, 
-                                groups = self.all_sprites, 
-                                collision_sprites = self.collision_sprites, 
-                                semi_collision_sprites = self.semi_collision_sprites, 
-                                ramp_collision_sprites = self.ramp_collision_sprites,
-                                frames = None)
-                
         # items
-        
-        # water
+        if (obj_layer == ITEM_OBJECTS):
+            if (obj.name not in level_frames["items"] or obj.id in self.collected_items):
+                return []
+            return [Item(
+                pos = (obj.x + obj.width / 2, obj.y + obj.height / 2),
+                frames = level_frames["items"][obj.name],
+                name = obj.name,
+                obj_id = obj.id,
+                groups = (self.all_sprites, self.item_sprites),
+                clocks = self.animation_clocks)]
 
-        # triggers
+        return []
 
-    def run(self, dt, event_list):
-        # game loop here for level. like checking collisions and updating screen
-        self.display_surface.fill("black")
+    def create_projectile(self, pos, direction):
+        self.projectiles.fire(pos, direction * ENEMY_PROJECTILE_SPEED, ENEMY_OWNER, ENEMY_BALL)
+
+    def is_removed(self, sprite):
+        """
+        true for sprites taken out of the level for good, collected items and killed enemies
+        """
+        if (hasattr(sprite, "obj_id")):
+            return sprite.obj_id in self.collected_items
+        if (hasattr(sprite, "health")):
+            return sprite.health <= 0
+        return False
+
+    def is_resident(self, sprite):
+        chunk = getattr(sprite, "chunk", None)
+        return chunk is None or chunk.resident
+
+    def snapshot(self):
+        """
+        mutable state of the level as plain data, static sprites are not part of it
+        """
+        return {
+            "player": self.player.save_state(),
+            "sprites": tuple(sprite.save_state() if hasattr(sprite, "save_state") else None for sprite in self.stateful_sprites),
+            "collected_items": frozenset(self.collected_items),
+            "score": self.score,
+            "clocks": self.animation_clocks.save_state(),
+            "projectiles": self.projectiles.save_state(),
+            "enemy_scheduler": self.enemy_scheduler.save_state(),
+            # the enemy scheduler works from the view of the last draw
+            "camera": tuple(self.all_sprites.offset),
+            "chunks": self.chunk_streamer.save_state() if (self.chunk_streamer) else None,
+            "revision": self.revision
+        }
+
+    def restore(self, snapshot):
+        """
+        put the level back to a snapshot, without building any sprite.
+        In chunked mode, sprites built after the snapshot was taken go back to their state when built
+        """
+        if (snapshot["revision"] != self.revision):
+            raise ValueError("snapshot was taken before the map was reloaded")
+        self.player.load_state(snapshot["player"])
+        self.collected_items = set(snapshot["collected_items"])
+        self.score = snapshot["score"]
+        self.animation_clocks.load_state(snapshot["clocks"])
+        self.projectiles.load_state(snapshot["projectiles"])
+        if (self.chunk_streamer):
+            self.chunk_streamer.load_state(snapshot["chunks"])
+        self.enemy_scheduler.load_state(snapshot["enemy_scheduler"], self.stateful_sprites)
+        self.all_sprites.offset.update(snapshot["camera"])
+
+        sprite_states = snapshot["sprites"] + tuple(sprite.spawn_state for sprite in self.stateful_sprites[len(snapshot["sprites"]):])
+        for sprite, state in zip(self.stateful_sprites, sprite_states):
+            if (state is not None):
+                sprite.load_state(state)
+
+            # collected items and killed enemies come back or leave depending on the snapshot
+            keep = self.is_resident(sprite) and not self.is_removed(sprite)
+            if (keep and not sprite.alive()):
+                sprite.add(sprite.home_groups)
+            elif (not keep and sprite.alive()):
+                sprite.kill()
+
+        # enemies built by the chunk streamer after the snapshot was taken
+        for sprite in self.stateful_sprites[len(snapshot["sprites"]):]:
+            if (hasattr(sprite, "think") and sprite.alive()):
+                self.enemy_scheduler.add(sprite)
+
+    def reload(self, tmx_map):
+        """
+        swap in an edited version of the map. Only the tiles and objects that are different in it are rebuilt,
+        the player and every other sprite keep their state. Returns the number of tiles and objects that changed
+        """
+        tiles = changed_tiles(self.tmx_map, tmx_map)
+        removed, added = changed_objects(self.tmx_map, tmx_map)
+
+        self.tmx_map = tmx_map
+        self.tmx_map_max_width = tmx_map.width
+        if (self.chunk_streamer):
+            self.chunk_streamer.set_map(tmx_map)
+
+        for layer, x, y in tiles:
+            if (self.chunk_streamer):
+                self.chunk_streamer.reload_tile(layer, x, y)
+                continue
+            sprite = self.tile_sprites.pop((layer, x, y), None)
+            if (sprite):
+                sprite.kill()
+            surf = self.tile_surface(layer, x, y)
+            if (surf):
+                self.spawn_tile(layer, x, y, surf)
+
+        dropped = set()
+        for obj_id in removed:
+            sprites = self.object_sprites.pop(obj_id, [])
+            for sprite in sprites:
+                sprite.kill()
+                dropped.add(sprite)
+            if (self.chunk_streamer):
+                self.chunk_streamer.remove_object(obj_id, sprites)
+
+        # the sprites left keep their order, so the snapshot indices stay dense
+        self.stateful_sprites = [sprite for sprite in self.stateful_sprites if sprite not in dropped]
+        for index, sprite in enumerate(self.stateful_sprites):
+            sprite.state_index = index
+        self.enemy_scheduler.discard(dropped)
+
+        for obj_layer, obj in added:
+            if (self.chunk_streamer):
+                self.chunk_streamer.add_object(obj_layer, obj)
+            else:
+                self.spawn_object(obj_layer, obj)
+
+        # the player updates after everything it can stand on
+        self.player.remove(self.all_sprites)
+        self.player.add(self.all_sprites)
+
+        self.revision += 1
+        return len(tiles), len(set(removed) | {obj.id for _, obj in added})
+
+    def collect_items(self):
+        """
+        pick up the items touching the player, only the cells around the player are looked at
+        """
+        for item in self.item_sprites.candidates(self.player.hitbox_rect):
+            if (item.rect.colliderect(self.player.hitbox_rect)):
+                self.score += item.value
+                self.collected_items.add(item.obj_id)
+                item.kill()
+                self.events.emit(ITEM_COLLECTED, name = item.name, value = item.value, score = self.score)
+
+    def close(self):
+        """
+        stop the handlers of this level from getting events, before the level is dropped
+        """
+        self.events.unsubscribe_object(self.player)
+
+    def set_render_target(self, surface, scale = 1):
+        """
+        draw into surface at scale times the window resolution, instead of the display surface
+        """
+        self.display_surface = surface
+        self.all_sprites.set_scale(scale)
+
+    def update(self, dt):
+        # game loop here for level. like checking collisions
+        if (self.chunk_streamer):
+            self.chunk_streamer.update(self.player.hitbox_rect.centerx)
 
         # update sprites
-        self.all_sprites.update(dt, event_list)
+        self.animation_clocks.update(dt)
+        self.all_sprites.update(dt)
+        self.collect_items()
+        self.enemy_scheduler.update(dt, self.all_sprites.view_rect(), self.player)
+        self.projectiles.update(dt, self.player)
+
+    def render_list(self):
+        """
+        (image, screen position) of everything to draw this frame, positions are copied so the list stays valid while the next frame is simulated
+        """
+        self.all_sprites.update_camera(self.player.hitbox_rect.center, self.player.hitbox_rect.width, self.tmx_map_max_width)
+        blits = self.all_sprites.render_list()
+        blits.extend(self.projectiles.render_list(self.all_sprites.offset, self.all_sprites.scale, self.all_sprites.scaled))
+        return tuple(blits)
+
+    def draw(self):
+        self.display_surface.fill("black")
 
         # draw all sprites
-        self.all_sprites.draw(self.player.hitbox_rect.center, self.player.hitbox_rect.width, self.tmx_map_max_width)
+        self.display_surface.fblits(self.render_list())
+
+    def run(self, dt):
+        self.update(dt)
+        self.draw()
+
+    def step(self, dt):
+        """
+        update, then return the frame to draw as (target surface, render scale, render list). Only touches the simulation, so it can run on a worker thread
+        """
+        self.update(dt)
+        return self.display_surface, self.all_sprites.scale, self.render_list()
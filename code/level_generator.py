@@ -0,0 +1,247 @@
+"""
+Writes random but playable TMX maps with the layer names from settings.py and the shipped tilesets, for benchmarks.
+
+    python level_generator.py out.tmx --width 1000 --seed 3
+"""
+import argparse
+import os.path
+import random
+import xml.etree.ElementTree as ET
+
+from settings import TILE_SIZE, BG, BG_DETAILS, TERRAIN_BASIC, TERRAIN_FLOOR_ONLY, TERRAIN_R_RAMP, TERRAIN_L_RAMP, PLATFORMS_PARTIAL, \
+    MID_DETAILS, GENERAL_OBJECTS, MOVING_OBJECTS, PLAYER_OBJECTS, ENEMY_OBJECTS, ITEM_OBJECTS, WATER_OBJECTS, FG, TRIGGERS
+
+TILESET_DIR = os.path.join("..", "data", "tilesets")
+# same tilesets and first gids as the shipped maps
+TILESETS = [(1, "objects_characters.tsx"), (14, "objects_env.tsx"), (75, "tiles_terrain.tsx"), (103, "items.tsx")]
+
+# grass tiles of tiles_terrain
+GROUND_FILL = 76        # grassCenter
+GROUND_TOP = 81         # grassMid
+R_RAMP = 77             # grassHillLeft, "/"
+R_RAMP_BELOW = 78       # grassHillLeft2
+L_RAMP = 79             # grassHillRight, "\"
+L_RAMP_BELOW = 80       # grassHillRight2
+HALF_LEFT, HALF_MID, HALF_RIGHT = 99, 100, 101
+
+# name: (gid, width, height) of the tile objects
+OBJECTS = {
+    "player": (5, 92, 66),
+    "floor_spikes": (4, 64, 64),
+    "bats": (12, 44, 30),
+    "dog": (3, 51, 51),
+    "squirrel": (8, 54, 31),
+    "wasp": (10, 66, 42),
+    "bird": (2, 72, 36),
+    "denta": (103, 64, 64),
+    "kibble": (104, 64, 64),
+}
+GROUND_ENEMIES = ("dog", "squirrel")
+AIR_ENEMIES = ("wasp", "bird")
+
+# columns at each end kept flat, the player starts on the left
+SAFE_COLUMNS = 6
+
+def ground_profile(rnd, width, height, density, ramp_ratio):
+    """
+    returns the number of ground tiles per column (0 for a gap) and the ramp, if any, sitting on each column: "r", "l" or None
+    """
+    max_height = max(1, height // 3)
+    heights = []
+    level = 1
+    while (len(heights) < width):
+        column = len(heights)
+        safe = (column < SAFE_COLUMNS or column >= width - SAFE_COLUMNS)
+        if (not safe and rnd.random() > density):
+            heights.extend([0] * rnd.randint(1, 3))
+            continue
+        if (not safe):
+            level = min(max_height, max(1, level + rnd.choice((-1, 0, 1))))
+        heights.extend([level] * rnd.randint(3, 10))
+    heights = heights[:width]
+
+    ramps = [None] * width
+    for column in range(1, width):
+        left, right = heights[column - 1], heights[column]
+        if (not left or not right or rnd.random() >= ramp_ratio):
+            continue
+        if (right == left + 1 and ramps[column - 1] is None):
+            # "/" on the lower column, leading up to the higher one
+            ramps[column - 1] = "r"
+        elif (left == right + 1):
+            ramps[column] = "l"
+    return heights, ramps
+
+def tile_layers(rnd, width, height, heights, ramps, semi_platforms):
+    layers = {name: [[0] * width for row in range(height)] for name in (BG, TERRAIN_BASIC, TERRAIN_FLOOR_ONLY, TERRAIN_R_RAMP, TERRAIN_L_RAMP, PLATFORMS_PARTIAL, FG)}
+    basic = layers[TERRAIN_BASIC]
+
+    for column, ground in enumerate(heights):
+        if (not ground):
+            continue
+        top = height - ground
+        for row in range(top, height):
+            basic[row][column] = GROUND_FILL
+        basic[top][column] = GROUND_TOP
+        if (ramps[column] == "r"):
+            layers[TERRAIN_R_RAMP][top - 1][column] = R_RAMP
+            basic[top][column] = R_RAMP_BELOW
+        elif (ramps[column] == "l"):
+            layers[TERRAIN_L_RAMP][top - 1][column] = L_RAMP
+            basic[top][column] = L_RAMP_BELOW
+
+    # one way platforms, three tiles over the highest ground under them
+    for index in range(semi_platforms):
+        length = rnd.randint(3, 5)
+        start = rnd.randint(SAFE_COLUMNS, max(SAFE_COLUMNS, width - SAFE_COLUMNS - length))
+        row = height - max(heights[start:start + length]) - 4
+        if (row < 1):
+            continue
+        for column in range(start, start + length):
+            layers[TERRAIN_FLOOR_ONLY][row][column] = HALF_MID
+        layers[TERRAIN_FLOOR_ONLY][row][start] = HALF_LEFT
+        layers[TERRAIN_FLOOR_ONLY][row][start + length - 1] = HALF_RIGHT
+    return layers
+
+class ObjectWriter:
+    """
+    adds objects to object groups, with map unique ids
+    """
+    def __init__(self):
+        self.next_id = 1
+
+    def add(self, group, name, x, y, width, height, gid = None, **properties):
+        attributes = {"id": str(self.next_id), "name": name}
+        if (gid is not None):
+            attributes["gid"] = str(gid)
+        attributes.update(x = f"{x:g}", y = f"{y:g}", width = f"{width:g}", height = f"{height:g}")
+        obj = ET.SubElement(group, "object", attributes)
+        self.next_id += 1
+
+        if (properties):
+            props = ET.SubElement(obj, "properties")
+            for key, value in properties.items():
+                kind = "bool" if isinstance(value, bool) else "float"
+                ET.SubElement(props, "property", {"name": key, "type": kind, "value": str(value).lower() if (kind == "bool") else f"{value:g}"})
+        return obj
+
+    def add_tile(self, group, name, x, bottom, **properties):
+        # tile objects are anchored at their bottom left corner in Tiled
+        gid, width, height = OBJECTS[name]
+        return self.add(group, name, x, bottom, width, height, gid, **properties)
+
+def generate(width = 200, height = 11, density = 0.9, ramp_ratio = 0.3, moving_platforms = None, bats = None, spikes = None,
+             enemies = None, items = None, semi_platforms = None, seed = 0, tileset_dir = TILESET_DIR):
+    """
+    returns the map as an ElementTree. Object counts left at None scale with the width like the shipped maps
+    """
+    rnd = random.Random(seed)
+    per_screen = width / 20
+    moving_platforms = round(per_screen) if (moving_platforms is None) else moving_platforms
+    bats = round(per_screen / 2) if (bats is None) else bats
+    spikes = round(per_screen) if (spikes is None) else spikes
+    enemies = round(per_screen * 2) if (enemies is None) else enemies
+    items = round(per_screen * 3) if (items is None) else items
+    semi_platforms = round(per_screen) if (semi_platforms is None) else semi_platforms
+
+    heights, ramps = ground_profile(rnd, width, height, density, ramp_ratio)
+    layers = tile_layers(rnd, width, height, heights, ramps, semi_platforms)
+
+    root = ET.Element("map", {
+        "version": "1.10", "tiledversion": "1.10.2", "orientation": "orthogonal", "renderorder": "right-down",
+        "width": str(width), "height": str(height), "tilewidth": str(TILE_SIZE), "tileheight": str(TILE_SIZE), "infinite": "0"})
+    for firstgid, source in TILESETS:
+        ET.SubElement(root, "tileset", {"firstgid": str(firstgid), "source": os.path.join(tileset_dir, source).replace(os.sep, "/")})
+
+    layer_ids = iter(range(1, 100))
+    def tile_layer(name):
+        layer = ET.SubElement(root, "layer", {"id": str(next(layer_ids)), "name": name, "width": str(width), "height": str(height)})
+        data = ET.SubElement(layer, "data", {"encoding": "csv"})
+        data.text = "\n" + ",\n".join(",".join(str(gid) for gid in row) for row in layers[name]) + "\n"
+
+    def object_group(name):
+        return ET.SubElement(root, "objectgroup", {"id": str(next(layer_ids)), "name": name})
+
+    # same layer order as the shipped maps
+    tile_layer(BG)
+    object_group(BG_DETAILS)
+    for name in (TERRAIN_BASIC, TERRAIN_FLOOR_ONLY, TERRAIN_R_RAMP, TERRAIN_L_RAMP, PLATFORMS_PARTIAL):
+        tile_layer(name)
+    object_group(MID_DETAILS)
+    general = object_group(GENERAL_OBJECTS)
+    moving = object_group(MOVING_OBJECTS)
+    player = object_group(PLAYER_OBJECTS)
+    enemy = object_group(ENEMY_OBJECTS)
+    item = object_group(ITEM_OBJECTS)
+    object_group(WATER_OBJECTS)
+    tile_layer(FG)
+    object_group(TRIGGERS)
+
+    objects = ObjectWriter()
+    map_height = height * TILE_SIZE
+    def ground_y(column):
+        return (height - heights[column]) * TILE_SIZE
+    # flat ground columns, no ramp on them, away from the start
+    flat = [column for column in range(SAFE_COLUMNS, width - SAFE_COLUMNS) if (heights[column] and not ramps[column])] or [2]
+
+    objects.add_tile(player, "player", 2 * TILE_SIZE, ground_y(2))
+    objects.add(general, "invis_wall", 0, 0, TILE_SIZE, map_height)
+    objects.add(general, "invis_wall", (width - 1) * TILE_SIZE, 0, TILE_SIZE, map_height)
+
+    for index in range(spikes):
+        column = rnd.choice(flat)
+        objects.add_tile(general, "floor_spikes", column * TILE_SIZE, ground_y(column), inverted = False)
+
+    for index in range(moving_platforms):
+        column = rnd.randint(SAFE_COLUMNS, width - SAFE_COLUMNS)
+        top = max(TILE_SIZE, ground_y(min(column, width - 1)) - 3 * TILE_SIZE) if (heights[min(column, width - 1)]) else 4 * TILE_SIZE
+        props = dict(flip = False, full_collision = False, platform = True, speed = rnd.choice((2, 3)), start_end = rnd.random() < 0.3)
+        if (rnd.random() < 0.7):
+            objects.add(moving, "platform", column * TILE_SIZE, top, rnd.randint(3, 7) * TILE_SIZE, 10, **props)
+        else:
+            objects.add(moving, "platform", column * TILE_SIZE + TILE_SIZE / 2, max(TILE_SIZE, top - 2 * TILE_SIZE), 10, 3 * TILE_SIZE, **props)
+
+    for index in range(bats):
+        column = rnd.randint(SAFE_COLUMNS, width - SAFE_COLUMNS)
+        objects.add_tile(moving, "bats", column * TILE_SIZE, rnd.randint(2, max(2, height - 5)) * TILE_SIZE,
+            end_angle = rnd.choice((180, -1)), platform = False, radius = rnd.randint(50, 120), speed = 2, start_angle = 0)
+
+    for index in range(enemies):
+        if (rnd.random() < 0.6):
+            column = rnd.choice(flat)
+            objects.add_tile(enemy, rnd.choice(GROUND_ENEMIES), column * TILE_SIZE, ground_y(column))
+        else:
+            column = rnd.randint(SAFE_COLUMNS, width - SAFE_COLUMNS)
+            objects.add_tile(enemy, rnd.choice(AIR_ENEMIES), column * TILE_SIZE, rnd.randint(2, max(2, height - 5)) * TILE_SIZE)
+
+    for index in range(items):
+        column = rnd.randint(SAFE_COLUMNS, width - SAFE_COLUMNS - 1)
+        bottom = (ground_y(column) if (heights[column]) else map_height - 2 * TILE_SIZE) - TILE_SIZE
+        objects.add_tile(item, rnd.choice(("kibble", "denta")), column * TILE_SIZE, bottom)
+
+    root.set("nextlayerid", str(next(layer_ids)))
+    root.set("nextobjectid", str(objects.next_id))
+    tree = ET.ElementTree(root)
+    ET.indent(tree, " ")
+    return tree
+
+def write_level(path, **options):
+    """
+    generate a map and write it to path, the tileset paths are made relative to where it is written
+    """
+    tileset_dir = os.path.relpath(os.path.abspath(TILESET_DIR), os.path.dirname(os.path.abspath(path)))
+    generate(tileset_dir = tileset_dir, **options).write(path, encoding = "UTF-8", xml_declaration = True)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "write a random TMX level for benchmarks")
+    parser.add_argument("path")
+    parser.add_argument("--width", type = int, default = 200, help = "tiles")
+    parser.add_argument("--height", type = int, default = 11, help = "tiles")
+    parser.add_argument("--density", type = float, default = 0.9, help = "chance a ground segment is not a gap")
+    parser.add_argument("--ramp-ratio", type = float, default = 0.3, help = "chance a one tile step gets a ramp")
+    for name in ("moving-platforms", "bats", "spikes", "enemies", "items", "semi-platforms"):
+        parser.add_argument(f"--{name}", type = int, default = None, help = "defaults scale with the width")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = vars(parser.parse_args())
+    print(write_level(args.pop("path"), **args))
@@ -1,64 +1,207 @@
+from time import perf_counter
+# before the other imports, so the startup timeline includes them
+import_start = perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+
 from pytmx.util_pygame import load_pygame
 
-from debug import debug
 from settings import *
 from level import Level
 from support import *
+from events import EventBus
+from rendering import Renderer
+from pacing import FramePacer
+from startup import StartupTimeline
+from hot_reload import MapWatcher
+
+# name: (loader, arguments) of the graphics for the sprites of every level
+LEVEL_FRAMES = {
+    'items': (import_sub_folders, ('..', 'graphics', 'items')),
+    'platform': (import_folder, ('..', 'graphics', 'level', 'platform')),
+    'boat': (import_folder, ('..',  'graphics', 'objects', 'boat')),
+    'floor_spikes': (import_folder, ('..', 'graphics','enemies', 'floor_spikes')),
+    'thorn_bush': (import_folder, ('..', 'graphics','enemies', 'thorn_bush')),
+    'bats': (import_folder, ('..', 'graphics','enemies', 'bats')),
+    'dog': (import_folder, ('..', 'graphics','enemies', 'dog')),
+    'squirrel': (import_folder, ('..', 'graphics','enemies', 'squirrel')),
+    'wasp': (import_folder, ('..', 'graphics','enemies', 'wasp')),
+    'bird': (import_folder, ('..', 'graphics','enemies', 'bird')),
+    'projectile': (make_ball, (8, 'orange')),
+    'player_ball': (make_ball, (10, 'lightblue')),
+    'water_top': (import_folder, ('..', 'graphics', 'level', 'water', 'top')),
+    'water_body': (import_image, ('..', 'graphics', 'level', 'water', 'body')),
+    'cloud_small': (import_folder, ('..', 'graphics','level', 'clouds', 'small')),
+    'cloud_large': (import_image, ('..', 'graphics','level', 'clouds', 'large_cloud'))
+}
+
+# stage main, stage sub and file of every level
+LEVEL_FILES = [
+    (0, 0, "test_ground.tmx"),
+    (1, 1, "1_1.tmx"),
+    (1, 2, "1_2.tmx"),
+    (1, 3, "1_3.tmx"),
+    (1, 4, "1_4.tmx")
+]
+
+def import_level_frames(progress = None):
+    """
+    graphics for the sprites of every level, by name. progress is called with the fraction done after each one
+    """
+    level_frames = {}
+    for index, (name, (loader, args)) in enumerate(LEVEL_FRAMES.items()):
+        level_frames[name] = loader(*args)
+        if (progress):
+            progress((index + 1) / len(LEVEL_FRAMES))
+    return level_frames
 
 class Game:
     
-    def __init__(self):
-        pygame.init()
-        self.clock = pygame.time.Clock()
-        self.previous_time = time.time()
-        self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    def __init__(self, timeline = None):
+        self.timeline = timeline or StartupTimeline()
+
+        # only the display, fonts are started by debug when first used and there is no sound
+        pygame.display.init()
+        self.renderer = Renderer()
+        self.pacer = FramePacer(vsync = self.renderer.vsync)
+        self.display_surface = self.renderer.display_surface
         pygame.display.set_caption("Jackie Boy")
+        self.events = EventBus()
+        self.events.subscribe(pygame.QUIT, self.quit)
+        self.timeline.mark("display init")
+
+        # something on screen before the assets are loaded
+        self.show_loading(0)
+        self.timeline.mark("first frame")
+
         self.import_assets()
+        self.timeline.mark("asset load")
         
         self.curr_level = 3
 
-        self.level_maps = [
-            [0, 0, load_pygame(os.path.join("..", "data", "levels", "test_ground.tmx"))],
-            [1, 1, load_pygame(os.path.join("..", "data", "levels", "1_1.tmx"))],
-            [1, 2, load_pygame(os.path.join("..", "data", "levels", "1_2.tmx"))],
-            [1, 3, load_pygame(os.path.join("..", "data", "levels", "1_3.tmx"))],
-            [1, 4, load_pygame(os.path.join("..", "data", "levels", "1_4.tmx"))]
-        ]
+        # maps are parsed the first time they are played
+        self.level_maps = {}
+        level_data = self.load_map(self.curr_level)
+        self.timeline.mark("map parse")
+
+        self.run_level = Level(level_data, self.level_frames, self.events)
+        self.renderer.attach(self.run_level)
+        self.timeline.mark("Level.setup")
+
+        # edits saved in Tiled show up in the running level
+        self.watcher = MapWatcher(self.map_path(self.curr_level)) if (HOT_RELOAD) else None
+
+        if (STARTUP_REPORT):
+            print(self.timeline.report())
+
+    def show_loading(self, progress):
+        """
+        progress bar for the loading screen, also keeps the window responding while loading
+        """
+        pygame.event.pump()
+        surface = self.display_surface
+        width, height = surface.get_size()
+        bar = pygame.Rect(0, 0, width // 2, max(4, height // 40))
+        bar.center = (width // 2, height // 2)
 
-        self.run_level = Level(self.level_maps[self.curr_level], self.level_frames)
+        surface.fill("black")
+        pygame.draw.rect(surface, "white", bar, 1)
+        pygame.draw.rect(surface, "white", (bar.x, bar.y, bar.width * progress, bar.height))
+        pygame.display.flip()
 
     def import_assets(self):
-        self.level_frames = {
-            'items': import_sub_folders('..', 'graphics', 'items'),
-            'platform': import_folder('..', 'graphics', 'level', 'platform'),
-			'boat': import_folder('..',  'graphics', 'objects', 'boat'),
-            'floor_spikes': import_folder('..', 'graphics','enemies', 'floor_spikes'),
-            'thorn_bush': import_folder('..', 'graphics','enemies', 'thorn_bush'),
-            'bats': import_folder('..', 'graphics','enemies', 'bats'),
-            'water_top': import_folder('..', 'graphics', 'level', 'water', 'top'),
-			'water_body': import_image('..', 'graphics', 'level', 'water', 'body'),
-			'cloud_small': import_folder('..', 'graphics','level', 'clouds', 'small'),
-			'cloud_large': import_image('..', 'graphics','level', 'clouds', 'large_cloud')
-        }
+        self.level_frames = import_level_frames(self.show_loading)
+
+    def map_path(self, index):
+        return os.path.join("..", "data", "levels", LEVEL_FILES[index][2])
+
+    def load_map(self, index):
+        """
+        [stage main, stage sub, map] of a level, the map is parsed on the first call
+        """
+        if (index not in self.level_maps):
+            stage_main, stage_sub, _ = LEVEL_FILES[index]
+            self.level_maps[index] = [stage_main, stage_sub, optimize_tmx_images(load_pygame(self.map_path(index)))]
+        return self.level_maps[index]
+
+    def reload_level(self):
+        """
+        parse the map of the level being played again and apply only what changed to the level
+        """
+        start = time.perf_counter()
+        try:
+            tmx_map = optimize_tmx_images(load_pygame(self.watcher.path))
+        except Exception as error:
+            # caught half way through a save, the next check sees the finished file
+            print(f"hot reload of {self.watcher.path} failed: {error}")
+            return
+        parsed = time.perf_counter()
+
+        tiles, objects = self.run_level.reload(tmx_map)
+        self.level_maps[self.curr_level][2] = tmx_map
+        print(f"hot reload: {tiles} tiles, {objects} objects changed, parse {(parsed - start) * 1000:.1f} ms, apply {(time.perf_counter() - parsed) * 1000:.1f} ms")
+
+    def check_reload(self):
+        if (self.watcher and self.watcher.changed()):
+            self.reload_level()
+
+    def quit(self, event):
+        if (PACING_REPORT):
+            print(self.pacer.report())
+        pygame.quit()
+        sys.exit()
 
     def run(self):
+        if (PIPELINED):
+            self.run_pipelined()
+
+        # the first frame is one frame long, timing starts here and not before loading
+        dt = 1
+        self.pacer.start()
         while (True):
 
-            dt = (time.time() - self.previous_time) * FPS_TARGET
-            self.previous_time = time.time()
+            self.events.pump()
+            self.check_reload()
+
+            frame_start = time.perf_counter()
+            self.run_level.run(dt)
+            self.renderer.present()
+            self.pacer.presented(self.run_level.player.input_time)
+            self.renderer.frame_done((time.perf_counter() - frame_start) * 1000)
+
+            dt = self.pacer.wait()
+
+    def run_pipelined(self):
+        """
+        frame N+1 is simulated on a worker while frame N is drawn and presented here.
+        Events are pumped between frames, when the worker is idle, so handlers and the input snapshot never race the simulation
+        """
+        with ThreadPoolExecutor(max_workers = 1) as worker:
+            self.events.pump()
+            frame = self.run_level.step(0)
+            # the input the frame on screen reacted to, the player already has the next one by the time it is presented
+            frame_input_time = self.run_level.player.input_time
+            dt = 1
+            self.pacer.start()
+
+            while (True):
 
-            event_list = pygame.event.get()
-            for event in event_list:
-                if (event.type == pygame.QUIT):
-                    pygame.quit()
-                    sys.exit()
+                self.events.pump()
+                self.check_reload()
 
-            self.run_level.run(dt, event_list)
-            pygame.display.update()
+                frame_start = time.perf_counter()
+                next_frame = worker.submit(self.run_level.step, dt)
+                self.renderer.present(self.renderer.draw(frame))
+                self.pacer.presented(frame_input_time)
+                frame = next_frame.result()
+                frame_input_time = self.run_level.player.input_time
+                self.renderer.frame_done((time.perf_counter() - frame_start) * 1000)
 
-            self.clock.tick(FPS_MAX)
+                dt = self.pacer.wait()
 
 
 if __name__ == "__main__":
-    game = Game()
+    timeline = StartupTimeline(import_start)
+    timeline.mark("import")
+    game = Game(timeline)
     game.run()
\ No newline at end of file
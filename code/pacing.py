@@ -0,0 +1,116 @@
+import warnings
+
+from settings import *
+
+class Histogram:
+	"""
+	counts of ms values in fixed width buckets, the last bucket takes everything above
+	"""
+	def __init__(self, name, bucket_ms, buckets):
+		self.name = name
+		self.bucket_ms = bucket_ms
+		self.counts = [0] * buckets
+		self.total = 0
+		self.worst = 0
+
+	def add(self, ms):
+		self.counts[min(int(ms / self.bucket_ms), len(self.counts) - 1)] += 1
+		self.total += ms
+		self.worst = max(self.worst, ms)
+
+	def lines(self):
+		samples = sum(self.counts)
+		if (not samples):
+			return [f"{self.name}: no samples"]
+
+		lines = [f"{self.name}: {samples} frames, mean {self.total / samples:.3f} ms, worst {self.worst:.3f} ms"]
+		peak = max(self.counts)
+		for index, count in enumerate(self.counts):
+			if (count):
+				low = index * self.bucket_ms
+				label = f"{low:6.2f}+   " if (index == len(self.counts) - 1) else f"{low:6.2f}-{low + self.bucket_ms:<6.2f}"
+				lines.append(f"  {label} {count:7d} {'#' * max(1, round(count / peak * 40))}")
+		return lines
+
+class FramePacer:
+	"""
+	Waits out the rest of each frame with one of the FRAME_PACING strategies, on perf_counter_ns.
+	start() when the loop begins, wait() returns dt in frames of FPS_TARGET. Keeps histograms of how far each frame interval was from the target and of the input to present latency
+	"""
+	def __init__(self, fps = FPS_MAX, strategy = FRAME_PACING, vsync = True):
+		"""
+		vsync: whether presenting really waits for the display, the "vsync" strategy falls back to "sleep_spin" when it doesn't
+		"""
+		self.strategy = strategy
+		if (strategy == "vsync" and not vsync):
+			self.fall_back("vsync was not granted for the display")
+		self.period = 1_000_000_000 // fps
+		self.clock = pygame.time.Clock()
+		self.fps = fps
+
+		self.start()
+
+		# frames checked so far and how many of them presenting didn't wait for
+		self.vsync_frames = 0
+		self.vsync_short = 0
+
+		self.jitter = Histogram("frame jitter", 0.25, 32)
+		self.latency = Histogram("input to present", 2, 25)
+
+	def start(self):
+		"""
+		time the first frame from now, so whatever ran before the loop, like loading, is not part of it
+		"""
+		now = time.perf_counter_ns()
+		self.deadline = now + self.period
+		self.frame_start = now
+
+	def wait(self):
+		if (self.strategy == "sleep_spin"):
+			# sleep is only accurate to a ms or two, the end of the wait spins on the counter
+			remaining = self.deadline - time.perf_counter_ns()
+			spin = PACING_SPIN * 1_000_000
+			if (remaining > spin):
+				time.sleep((remaining - spin) / 1_000_000_000)
+			while (time.perf_counter_ns() < self.deadline):
+				pass
+		elif (self.strategy == "busy_loop"):
+			self.clock.tick_busy_loop(self.fps)
+		# vsync: presenting already waited for the display
+
+		now = time.perf_counter_ns()
+		interval = now - self.frame_start
+		self.frame_start = now
+		self.jitter.add(abs(interval - self.period) / 1_000_000)
+		if (self.strategy == "vsync" and self.vsync_frames < VSYNC_CHECK_FRAMES):
+			self.check_vsync(interval)
+
+		self.deadline += self.period
+		if (self.deadline < now):
+			# fell more than a frame behind, don't try to catch up with a burst of short frames
+			self.deadline = now + self.period
+
+		return min(interval / 1_000_000_000 * FPS_TARGET, PACING_MAX_DT)
+
+	def fall_back(self, reason):
+		warnings.warn(f"{reason}, pacing frames with sleep_spin instead")
+		self.strategy = "sleep_spin"
+
+	def check_vsync(self, interval):
+		"""
+		SDL can report vsync and still not wait when presenting, most frames coming in under half a period means it doesn't
+		"""
+		self.vsync_frames += 1
+		if (interval < self.period // 2):
+			self.vsync_short += 1
+		if (self.vsync_frames == VSYNC_CHECK_FRAMES and self.vsync_short > VSYNC_CHECK_FRAMES // 2):
+			self.fall_back("presenting does not wait for vsync")
+
+	def presented(self, input_time):
+		"""
+		call right after presenting, input_time is the perf_counter_ns the shown frame's input was sampled at
+		"""
+		self.latency.add((time.perf_counter_ns() - input_time) / 1_000_000)
+
+	def report(self):
+		return "\n".join(self.jitter.lines() + self.latency.lines())
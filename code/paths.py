@@ -0,0 +1,87 @@
+from bisect import bisect_right
+from math import sin, cos, radians, comb
+
+from settings import *
+
+class Path:
+	"""
+	Polyline sampled once into an arc length table, so a distance along it maps to a point with a search and one interpolation.
+	closed paths go back from the last point to the first
+	"""
+	def __init__(self, points, closed = False):
+		points = [vector(point) for point in points]
+		if (closed and points[0] != points[-1]):
+			points.append(points[0])
+		# repeated points would give zero length segments
+		self.points = [point for index, point in enumerate(points) if (index == 0 or point != points[index - 1])]
+		self.closed = closed
+
+		# distance from the start to each point, and the unit direction of the segment starting there
+		self.distances = [0]
+		self.tangents = []
+		for start, end in zip(self.points, self.points[1:]):
+			segment = end - start
+			self.distances.append(self.distances[-1] + segment.length())
+			self.tangents.append(segment.normalize())
+		self.length = self.distances[-1]
+		if (not self.tangents):
+			self.tangents.append(vector(1, 0))
+
+		# axis the path mostly runs along, the flipped frames are flipped on it
+		xs = [point.x for point in self.points]
+		ys = [point.y for point in self.points]
+		self.plane = "x" if (max(xs) - min(xs) >= max(ys) - min(ys)) else "y"
+
+	def segment(self, distance):
+		return min(max(bisect_right(self.distances, distance) - 1, 0), len(self.tangents) - 1)
+
+	def point_at(self, distance):
+		if (not self.length):
+			return vector(self.points[0])
+		index = self.segment(distance)
+		return self.points[index] + self.tangents[index] * (distance - self.distances[index])
+
+	def tangent_at(self, distance):
+		return self.tangents[self.segment(distance)]
+
+def bezier_points(controls, samples = BEZIER_SAMPLES):
+	"""
+	points on the Bezier curve of the control points, of degree len(controls) - 1, for building a Path
+	"""
+	degree = len(controls) - 1
+	weights = [comb(degree, index) for index in range(degree + 1)]
+	points = []
+	for step in range(samples + 1):
+		t = step / samples
+		x = y = 0
+		for index, (control_x, control_y) in enumerate(controls):
+			basis = weights[index] * t ** index * (1 - t) ** (degree - index)
+			x += basis * control_x
+			y += basis * control_y
+		points.append((x, y))
+	return points
+
+def tmx_path(obj):
+	"""
+	Path of a polyline or polygon object, its points are Bezier control points when it has the bezier property
+	"""
+	points = [(point.x, point.y) for point in obj.points]
+	if (obj.properties.get("bezier", False)):
+		if (obj.closed):
+			points.append(points[0])
+		return Path(bezier_points(points))
+	return Path(points, obj.closed)
+
+# cos and sin of every whole degree, angles in between are interpolated
+UNIT_CIRCLE = [(cos(radians(degree)), sin(radians(degree))) for degree in range(361)]
+
+def circle_point(angle):
+	"""
+	(cos, sin) of angle in degrees, from UNIT_CIRCLE
+	"""
+	angle %= 360
+	degree = int(angle)
+	fraction = angle - degree
+	cos_low, sin_low = UNIT_CIRCLE[degree]
+	cos_high, sin_high = UNIT_CIRCLE[degree + 1]
+	return cos_low + (cos_high - cos_low) * fraction, sin_low + (sin_high - sin_low) * fraction
@@ -0,0 +1,226 @@
+"""
+Runs the player physics of two collision backends side by side and reports the first frame where they disagree.
+The reference runs the player's collision queries as linear scans over whole groups, like before the collision index.
+The candidate is the level as the game builds it, optionally with chunk streaming. Run from the code folder:
+
+    python physics_diff.py                              randomized input on every map
+    python physics_diff.py --input run.json             replay a recording on every map
+    python physics_diff.py record run.json --level 1_3  play in a window and record the keys
+
+Exits with 1 when any run diverges
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+
+import pygame
+from pytmx.util_pygame import load_pygame
+
+from settings import TILE_LAYERS, OBJECT_LAYERS, PLAYER_OBJECTS, FPS_TARGET
+from support import optimize_tmx_images
+from events import EventBus
+from level import Level
+from rendering import Renderer
+from main import Game, import_level_frames
+import timerClass
+
+# keys the player reads, by the names used in recordings
+KEYS = {"a": pygame.K_a, "d": pygame.K_d, "s": pygame.K_s, "space": pygame.K_SPACE}
+LEVELS_DIR = os.path.join("..", "data", "levels")
+
+class LinearIndex:
+    """
+    collision queries of a group answered by scanning every sprite in group order, the behaviour the grid has to match
+    """
+    def __init__(self, group):
+        self.group = group
+
+    def sprites_in(self, rect):
+        return self.group.sprites()
+
+    def __iter__(self):
+        return iter(self.group)
+
+    def __len__(self):
+        return len(self.group)
+
+def use_linear_index(level):
+    player = level.player
+    player.collision_sprites = LinearIndex(level.collision_sprites)
+    player.semi_collision_sprites = LinearIndex(level.semi_collision_sprites)
+    player.ramp_collision_sprites = LinearIndex(level.ramp_collision_sprites)
+
+def use_grid_index(level):
+    # what Level builds
+    pass
+
+BACKENDS = {"linear": use_linear_index, "grid": use_grid_index}
+
+class Keys:
+    """
+    pygame.key.get_pressed() stand in, holding the keys named in held
+    """
+    def __init__(self, held = ()):
+        self.held = {KEYS[name] for name in held}
+
+    def __getitem__(self, key):
+        return key in self.held
+
+def random_inputs(frames, seed):
+    """
+    per frame key names: mostly running right, with jumps, drops through platforms and turning around
+    """
+    rnd = random.Random(seed)
+    inputs = []
+    while (len(inputs) < frames):
+        held = []
+        if (rnd.random() < 0.75):
+            held.append("d")
+        elif (rnd.random() < 0.6):
+            held.append("a")
+        if (rnd.random() < 0.35):
+            held.append("space")
+        if (rnd.random() < 0.15):
+            held.append("s")
+        inputs.extend([held] * rnd.randint(3, 40))
+    return inputs[:frames]
+
+def player_state(player):
+    return {
+        "hitbox": tuple(player.hitbox_rect),
+        "velocity": tuple(player.velocity),
+        "collision_side": dict(player.collision_side),
+    }
+
+def build(tmx_map, level_frames, backend, chunked, events = None):
+    level = Level([0, 0, tmx_map], level_frames, events or EventBus(), chunked = chunked)
+    BACKENDS[backend](level)
+    return level
+
+def compare(tmx_map, level_frames, inputs, reference = "linear", candidate = "grid", chunked = False, dt = 1):
+    """
+    returns None when both backends agree on every frame, else (frame, differences, keys held, reference state, candidate state)
+    """
+    ticks = [0]
+    timerClass.set_time_source(lambda: ticks[0])
+    try:
+        levels = [build(tmx_map, level_frames, reference, False), build(tmx_map, level_frames, candidate, chunked)]
+        for frame, held in enumerate(inputs):
+            ticks[0] += round(1000 * dt / FPS_TARGET)
+            for level in levels:
+                level.events.input.keys = Keys(held)
+                level.update(dt)
+                # the enemy scheduler works from the camera of the last frame
+                level.all_sprites.update_camera(level.player.hitbox_rect.center, level.player.hitbox_rect.width, level.tmx_map_max_width)
+
+            states = [player_state(level.player) for level in levels]
+            differences = [name for name in states[0] if (states[0][name] != states[1][name])]
+            if (differences):
+                return frame, differences, held, states[0], states[1]
+        return None
+    finally:
+        timerClass.set_time_source()
+
+def map_paths(names):
+    paths = sorted(glob.glob(os.path.join(LEVELS_DIR, "*.tmx")))
+    if (names):
+        paths = [path for path in paths if (os.path.splitext(os.path.basename(path))[0] in names)]
+    return paths
+
+def load_map(path):
+    """
+    the map, or None when Level can't build it: a layer is missing or there is no player
+    """
+    tmx_map = optimize_tmx_images(load_pygame(path))
+    try:
+        for layer in TILE_LAYERS + OBJECT_LAYERS:
+            tmx_map.get_layer_by_name(layer)
+        has_player = any(obj.name == "player" for obj in tmx_map.get_layer_by_name(PLAYER_OBJECTS))
+    except ValueError:
+        has_player = False
+    return tmx_map if (has_player) else None
+
+def record(path, level_name):
+    """
+    play the level in a window, the keys held on every frame are written to path when the window is closed
+    """
+    game = Game()
+    tmx_map = load_map(os.path.join(LEVELS_DIR, f"{level_name}.tmx"))
+    game.run_level.close()
+    game.run_level = build(tmx_map, game.level_frames, "grid", None, game.events)
+    game.renderer.attach(game.run_level)
+
+    game.events.unsubscribe(pygame.QUIT, game.quit)
+    running = [True]
+    game.events.subscribe(pygame.QUIT, lambda event: running.__setitem__(0, False))
+
+    inputs = []
+    game.pacer.start()
+    while (running[0]):
+        game.events.pump()
+        keys = game.events.input.keys
+        held = [name for name, key in KEYS.items() if (keys[key])]
+        inputs.append(held)
+        game.run_level.run(1)
+        game.renderer.present()
+        game.pacer.wait()
+
+    with open(path, "w") as file:
+        json.dump({"level": level_name, "inputs": inputs}, file)
+    print(f"{len(inputs)} frames written to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description = "differential test of the player physics between collision backends")
+    parser.add_argument("command", nargs = "?", choices = ("diff", "record"), default = "diff")
+    parser.add_argument("path", nargs = "?", help = "record: where to write the recording")
+    parser.add_argument("--level", action = "append", help = "map name without .tmx, every map if left out")
+    parser.add_argument("--input", help = "recording to replay instead of randomized input")
+    parser.add_argument("--frames", type = int, default = 3000)
+    parser.add_argument("--seeds", type = int, default = 3, help = "randomized runs per map")
+    parser.add_argument("--reference", choices = BACKENDS, default = "linear")
+    parser.add_argument("--candidate", choices = BACKENDS, default = "grid")
+    parser.add_argument("--chunked", action = "store_true", help = "stream the candidate level in chunks")
+    args = parser.parse_args()
+
+    if (args.command == "record"):
+        record(args.path, (args.level or ["1_3"])[0])
+        return
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    Renderer()
+    level_frames = import_level_frames()
+
+    if (args.input):
+        with open(args.input) as file:
+            runs = [("recording", json.load(file)["inputs"])]
+    else:
+        runs = [(f"seed {seed}", random_inputs(args.frames, seed)) for seed in range(args.seeds)]
+
+    failed = False
+    for path in map_paths(args.level):
+        tmx_map = load_map(path)
+        name = os.path.basename(path)
+        if (tmx_map is None):
+            print(f"{name}: skipped, not a playable map")
+            continue
+        for label, inputs in runs:
+            result = compare(tmx_map, level_frames, inputs, args.reference, args.candidate, args.chunked)
+            if (result is None):
+                print(f"{name} {label}: {len(inputs)} frames match")
+                continue
+
+            failed = True
+            frame, differences, held, reference_state, candidate_state = result
+            print(f"{name} {label}: diverged at frame {frame} in {', '.join(differences)}, keys {held}")
+            for key in differences:
+                print(f"    {args.reference:>9}: {reference_state[key]}")
+                print(f"    {args.candidate:>9}: {candidate_state[key]}")
+
+    sys.exit(1 if (failed) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 from settings import *
-from timerClass import Timer
+from timerClass import Timer, get_ticks
+from projectiles import PLAYER_OWNER, PLAYER_BALL, ATTACK_HITBOX
+from events import PLAYER_HIT, InputSnapshot
 
 class Player(pygame.sprite.Sprite):
 
-    def __init__(self, pos, surf = pygame.Surface((TILE_SIZE,TILE_SIZE)), groups = None, collision_sprites = None, semi_collision_sprites = None, ramp_collision_sprites = None, frames = None):
+    def __init__(self, pos, surf = pygame.Surface((TILE_SIZE,TILE_SIZE)), groups = None, collision_sprites = None, semi_collision_sprites = None, ramp_collision_sprites = None, projectiles = None, events = None, frames = None):
         # general setup
         super().__init__(groups)
         self.z = Z_LAYERS["main"]
@@ -13,6 +15,7 @@ class Player(pygame.sprite.Sprite):
         self.frames, self.frame_index = frames, 0
         self.state, self.facing_right = "idle", True
         self.image = surf
+        self.visible = True
         #self.image = self.frames[self.state][self.frame_index]
 
         # rects
@@ -35,6 +38,14 @@ class Player(pygame.sprite.Sprite):
         self.list_collide_basic, self.list_collide_ramps, self.list_semi_collide = [], [], []
         self.platform = None
 
+        # input, the keys come from the per frame snapshot of the event bus. Without a bus the player samples its own
+        self.events = events
+        self.input = events.input if (events) else InputSnapshot()
+        self.input_time = self.input.sampled_at
+        if (events):
+            events.subscribe(pygame.MOUSEBUTTONDOWN, self.mouse_down)
+            events.subscribe(pygame.MOUSEBUTTONUP, self.mouse_up)
+
         # movement
         self.LEFT_KEY, self.RIGHT_KEY = False, False
         self.is_jumping = False
@@ -45,16 +56,24 @@ class Player(pygame.sprite.Sprite):
 
         # attacks
         self.is_attacking = False
+        self.projectiles = projectiles
+        self.charge_start = None   # ticks when the ball attack started charging
+        self.health = PLAYER_HEALTH
 
         # timer
         self.timers = {
             "wall_jump_move_block": Timer(200), # blocks the use of LEFT and RIGHT right after wall jump
             "unlock_semi_drop_down": Timer(100), # disables the floor collision for semi collision platforms so that the player can drop down through them
-            "normal_attack_cooldown": Timer(500)
+            "normal_attack_cooldown": Timer(500),
+            "invulnerable": Timer(PLAYER_INVULNERABLE)
         }
 
     def player_input(self):
-        keys = pygame.key.get_pressed()
+        if (not self.events):
+            self.input.sample()
+        keys = self.input.keys
+        # when the input this frame reacts to was sampled
+        self.input_time = self.input.sampled_at
 
         # key down
         if (keys[pygame.K_SPACE]):
@@ -83,11 +102,52 @@ class Player(pygame.sprite.Sprite):
             self.RIGHT_KEY = False
 
     def attack(self):
-        if (not self.is_attacking and not self.timers["normal_attack_cooldown"].active):
+        # the cooldown alone gates it, is_attacking is only cleared by the attack animation
+        if (not self.timers["normal_attack_cooldown"].active):
             self.is_attacking = True
             self.frame_index = 0
             self.timers["normal_attack_cooldown"].activate()
 
+            if (self.projectiles):
+                # short lived hitbox in front of the player
+                side = 1 if self.facing_right else -1
+                x = self.hitbox_rect.centerx + side * (self.hitbox_rect.width + ATTACK_HITBOX_WIDTH) / 2
+                self.projectiles.fire(
+                    pos = (x, self.hitbox_rect.centery),
+                    velocity = (self.velocity.x, 0),
+                    owner = PLAYER_OWNER,
+                    kind = ATTACK_HITBOX,
+                    size = (ATTACK_HITBOX_WIDTH, self.hitbox_rect.height),
+                    lifetime = ATTACK_HITBOX_LIFETIME,
+                    solid = False)
+
+    def ball_attack(self):
+        """
+        fire the charged ball, faster the longer the button was held
+        """
+        charge = min(get_ticks() - self.charge_start, PLAYER_BALL_MAX_CHARGE) / PLAYER_BALL_MAX_CHARGE
+        self.charge_start = None
+        if (self.projectiles):
+            side = 1 if self.facing_right else -1
+            self.projectiles.fire(self.hitbox_rect.center, (side * PLAYER_BALL_SPEED * (1 + charge), 0), PLAYER_OWNER, PLAYER_BALL)
+
+    def hit(self, damage = 1):
+        if (not self.timers["invulnerable"].active):
+            self.health -= damage
+            self.timers["invulnerable"].activate()
+            if (self.events):
+                self.events.emit(PLAYER_HIT, health = self.health)
+
+    def mouse_down(self, event):
+        if (event.button == 1):
+            self.attack()
+            self.charge_start = get_ticks()
+
+    def mouse_up(self, event):
+        # ball attack is a charge attack and only shoots when left button released
+        if (event.button == 1 and self.charge_start is not None):
+            self.ball_attack()
+
     def horizontal_movement(self, dt):
         """
         Blending Newton's Laws and Kinematic Equations for x
@@ -179,7 +239,7 @@ class Player(pygame.sprite.Sprite):
         self.list_semi_collide = []
 
         for group in [self.collision_sprites, self.semi_collision_sprites, self.ramp_collision_sprites]:
-            for sprite in group:
+            for sprite in group.sprites_in(tar_rect):
                 if sprite.rect.colliderect(tar_rect):
                     if (group == self.collision_sprites):
                         self.list_collide_basic.append(sprite)
@@ -202,9 +262,13 @@ class Player(pygame.sprite.Sprite):
         #pygame.draw.rect(self.display_surface, "green", left_rect)
         right_rect = pygame.FRect(self.hitbox_rect.topright + vector(0,self.hitbox_rect.height / 4),(1,self.hitbox_rect.height / 4))
         #pygame.draw.rect(self.display_surface, "green", right_rect)
-        collide_rects = [sprite.rect for sprite in self.collision_sprites]
+        # only the sprites around the probes, from the collision index
+        contact_area = self.hitbox_rect.inflate(4, 4)
+        collide_sprites = self.collision_sprites.sprites_in(contact_area)
+        semi_collide_sprites = self.semi_collision_sprites.sprites_in(contact_area)
+        collide_rects = [sprite.rect for sprite in collide_sprites]
         #semi_collide_rects = [sprite.rect for sprite in self.semi_collision_sprites]
-        collide_ramps = [sprite for sprite in self.ramp_collision_sprites]
+        collide_ramps = self.ramp_collision_sprites.sprites_in(contact_area)
         
         # check collisions
         # top
@@ -218,7 +282,6 @@ class Player(pygame.sprite.Sprite):
         curr_right_collide = True if (right_rect.collidelist(collide_rects) >= 0) else False
 
         # semi - collisions (floor only)
-        semi_collide_sprites = self.semi_collision_sprites.sprites()
         for spr in semi_collide_sprites:
             if (self.velocity.y >= 0 and bot_rect.colliderect(spr.rect) and bot_rect.top <= spr.rect.top):
                 # must be "falling", collided, and hit box top is less than or equal than the platform top
@@ -250,7 +313,7 @@ class Player(pygame.sprite.Sprite):
 
         # moving platform. Check if player is standing on one
         self.platform = None
-        platform_sprites = self.collision_sprites.sprites() + self.semi_collision_sprites.sprites()
+        platform_sprites = collide_sprites + semi_collide_sprites
         for sprite in [sprite for sprite in platform_sprites if hasattr(sprite, "moving")]:
             if (bot_rect.colliderect(sprite)):
                 self.platform = sprite
@@ -441,6 +504,35 @@ class Player(pygame.sprite.Sprite):
 
             self.velocity.x = 0
     
+    def save_state(self):
+        """
+        everything that changes while playing. The platform is left out, check_contact finds it again before it is used
+        """
+        return (
+            tuple(self.hitbox_rect), tuple(self.rect), tuple(self.old_rect),
+            tuple(self.velocity), tuple(self.acceleration),
+            self.is_jumping, self.LEFT_KEY, self.RIGHT_KEY, self.facing_right,
+            self.on_ramp_wall, tuple(self.on_ramp_slope.items()), tuple(self.collision_side.items()),
+            self.is_attacking, self.charge_start, self.health, self.state, self.frame_index,
+            tuple((name, timer.save_state()) for name, timer in self.timers.items()))
+
+    def load_state(self, state):
+        (hitbox_rect, rect, old_rect, velocity, acceleration,
+         self.is_jumping, self.LEFT_KEY, self.RIGHT_KEY, self.facing_right,
+         self.on_ramp_wall, on_ramp_slope, collision_side,
+         self.is_attacking, self.charge_start, self.health, self.state, self.frame_index, timers) = state
+
+        self.hitbox_rect.update(hitbox_rect)
+        self.rect.update(rect)
+        self.old_rect.update(old_rect)
+        self.velocity.update(velocity)
+        self.acceleration.update(acceleration)
+        self.on_ramp_slope.update(on_ramp_slope)
+        self.collision_side.update(collision_side)
+        for name, timer_state in timers:
+            self.timers[name].load_state(timer_state)
+        self.platform = None
+
     def update_timers(self):
         for timer in self.timers.values():
             timer.update()
@@ -474,18 +566,7 @@ class Player(pygame.sprite.Sprite):
                 else:
                     self.state = "jump" if self.velocity.y < 0 else "fall"
 
-    def update(self, dt, event_list):
-        for event in event_list:
-            if (event.type == pygame.MOUSEBUTTONDOWN):
-                if (event.button == 1):
-                    self.attack()
-                    print(event.pos)
-
-            # later ball attack is a charge attack and only shoots when left button released
-            # if (event.type == pygame.MOUSEBUTTONUP):
-            #     if (event.button == 1):
-            #         self.has_released_attack = True
-
+    def update(self, dt):
         self.old_rect = self.hitbox_rect.copy()
         self.update_timers()
 
@@ -0,0 +1,176 @@
+from array import array
+
+from settings import *
+
+# who fired, decides what the projectile can hit
+PLAYER_OWNER, ENEMY_OWNER = 0, 1
+# index into the pool surfaces
+ENEMY_BALL, PLAYER_BALL, ATTACK_HITBOX = 0, 1, 2
+
+class ProjectilePool:
+	"""
+	Fixed size pool for projectiles and attack hitboxes.
+	Positions, velocities and the rest live in flat arrays indexed by slot. Firing takes a free slot, so no Sprite is built and no group changes
+	"""
+	def __init__(self, surfaces, collision_sprites, damage_sprites, size = PROJECTILE_POOL_SIZE):
+		# kind index -> surface, None for invisible hitboxes
+		self.surfaces = surfaces
+		self.collision_sprites = collision_sprites
+		self.damage_sprites = damage_sprites
+		self.size = size
+
+		# center, velocity, hitbox size and remaining frames per slot
+		self.x = array("d", [0]) * size
+		self.y = array("d", [0]) * size
+		self.vx = array("d", [0]) * size
+		self.vy = array("d", [0]) * size
+		self.w = array("d", [0]) * size
+		self.h = array("d", [0]) * size
+		self.life = array("d", [0]) * size
+		self.owner = array("b", [0]) * size
+		self.kind = array("b", [0]) * size
+		self.damage = array("b", [0]) * size
+		self.solid = array("b", [0]) * size
+
+		# active slots are packed at the front, free ones after. Releasing swaps with the last active
+		self.slots = array("i", range(size))
+		self.count = 0
+
+		# reused every frame
+		self.probe = pygame.FRect(0, 0, 0, 0)
+		self.target_cells = {}
+
+	def fire(self, pos, velocity, owner, kind = 0, size = (PROJECTILE_SIZE, PROJECTILE_SIZE), lifetime = PROJECTILE_LIFETIME, damage = 1, solid = True):
+		"""
+		returns the slot, or -1 if the pool is exhausted and the shot is dropped
+		"""
+		if (self.count >= self.size):
+			return -1
+		i = self.slots[self.count]
+		self.count += 1
+
+		self.x[i], self.y[i] = pos
+		self.vx[i], self.vy[i] = velocity
+		self.w[i], self.h[i] = size
+		self.life[i] = lifetime
+		self.owner[i] = owner
+		self.kind[i] = kind
+		self.damage[i] = damage
+		# solid projectiles stop on terrain, melee hitboxes don't
+		self.solid[i] = solid
+		return i
+
+	def release(self, index):
+		"""
+		free the slot at position index of the active part of self.slots
+		"""
+		self.count -= 1
+		last = self.count
+		self.slots[index], self.slots[last] = self.slots[last], self.slots[index]
+
+	def clear(self):
+		self.count = 0
+
+	def save_state(self):
+		# array slices are copies, a few memcpys for the whole pool
+		return (self.count, self.slots[:], self.x[:], self.y[:], self.vx[:], self.vy[:], self.w[:], self.h[:], self.life[:], self.owner[:], self.kind[:], self.damage[:], self.solid[:])
+
+	def load_state(self, state):
+		self.count = state[0]
+		for array_, saved in zip((self.slots, self.x, self.y, self.vx, self.vy, self.w, self.h, self.life, self.owner, self.kind, self.damage, self.solid), state[1:]):
+			array_[:] = saved
+
+	def player_shot_area(self, dt):
+		"""
+		rect around every live player shot and where it moves this frame, None when there is none
+		"""
+		area = None
+		for index in range(self.count):
+			i = self.slots[index]
+			if (self.owner[i] == PLAYER_OWNER):
+				rect = pygame.FRect(0, 0, self.w[i], self.h[i])
+				rect.center = (self.x[i], self.y[i])
+				rect.union_ip(rect.move(self.vx[i] * dt, self.vy[i] * dt))
+				area = rect if (area is None) else area.union(rect)
+		return area
+
+	def fill_target_cells(self, area):
+		"""
+		broadphase for the damage group, only the targets touching area are bucketed. Enemies move, so it is built again every frame
+		"""
+		self.target_cells.clear()
+		size = GRID_CELL_SIZE
+		for sprite in area.collideobjectsall(self.damage_sprites.sprites(), key = lambda sprite: sprite.rect):
+			rect = sprite.rect
+			for col in range(int(rect.left // size), int(rect.right // size) + 1):
+				for row in range(int(rect.top // size), int(rect.bottom // size) + 1):
+					bucket = self.target_cells.get((col, row))
+					if (bucket is None):
+						bucket = self.target_cells[(col, row)] = []
+					bucket.append(sprite)
+
+	def hit_target(self, rect):
+		size = GRID_CELL_SIZE
+		for col in range(int(rect.left // size), int(rect.right // size) + 1):
+			for row in range(int(rect.top // size), int(rect.bottom // size) + 1):
+				bucket = self.target_cells.get((col, row))
+				if (bucket):
+					for sprite in bucket:
+						if (sprite.rect.colliderect(rect) and sprite.alive()):
+							return sprite
+		return None
+
+	def update(self, dt, player):
+		if (not self.count):
+			return
+
+		area = self.player_shot_area(dt)
+		if (area):
+			self.fill_target_cells(area)
+
+		probe = self.probe
+		index = 0
+		while (index < self.count):
+			i = self.slots[index]
+			self.x[i] += self.vx[i] * dt
+			self.y[i] += self.vy[i] * dt
+			self.life[i] -= dt
+
+			probe.size = (self.w[i], self.h[i])
+			probe.center = (self.x[i], self.y[i])
+
+			spent = self.life[i] <= 0 or (self.solid[i] and self.collision_sprites.collides(probe))
+			if (not spent):
+				if (self.owner[i] == PLAYER_OWNER):
+					target = self.hit_target(probe)
+					if (target):
+						# things without health, like spikes, just absorb it
+						if (hasattr(target, "hit")):
+							target.hit(self.damage[i])
+						spent = True
+				elif (player.hitbox_rect.colliderect(probe)):
+					player.hit(self.damage[i])
+					spent = True
+
+			if (spent):
+				# the last active slot is swapped in here, check this index again
+				self.release(index)
+			else:
+				index += 1
+
+	def render_list(self, offset, scale = 1, scaled = None):
+		"""
+		(surface, screen position) of every visible projectile, scaled is the image lookup of the sprite group for scale below 1
+		"""
+		blits = []
+		for index in range(self.count):
+			i = self.slots[index]
+			surf = self.surfaces[self.kind[i]]
+			if (surf):
+				x = self.x[i] - surf.get_width() / 2 + offset.x
+				y = self.y[i] - surf.get_height() / 2 + offset.y
+				if (scale == 1):
+					blits.append((surf, (x, y)))
+				else:
+					blits.append((scaled(surf), (round(x * scale), round(y * scale))))
+		return blits
@@ -0,0 +1,99 @@
+import warnings
+
+from settings import *
+
+class Renderer:
+	"""
+	Owns the display and the surface the level draws into.
+	The level draws at scale times the window size, present() scales that up to the display when they differ.
+	In "scaled" mode a scale change makes a new SCALED display at the new logical size, so SDL keeps doing the upscale on the GPU
+	"""
+	def __init__(self, scale = RENDER_SCALE, present = RENDER_PRESENT, dynamic = DYNAMIC_RENDER_SCALE, vsync = FRAME_PACING == "vsync"):
+		self.present_mode = present
+		self.dynamic = dynamic
+
+		if (self.present_mode == "scaled"):
+			# logical size of the display, SDL scales it to the window on the GPU
+			self.display_surface = pygame.display.set_mode(self.internal_size(scale), pygame.SCALED, vsync = int(vsync))
+		else:
+			self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+		# SDL can refuse vsync, then presenting doesn't wait for the display
+		self.vsync = vsync and self.present_mode == "scaled" and pygame.display.is_vsync()
+		self.window_size = pygame.display.get_window_size()
+		self.window = None
+		if (self.present_mode == "scaled" and self.dynamic):
+			# only used to put the window size back after the display is made again, not to draw
+			with warnings.catch_warnings():
+				warnings.simplefilter("ignore", DeprecationWarning)
+				self.window = pygame.Window.from_display_module()
+
+		# no step above the starting scale, the display would have to be bigger. A step the starting scale isn't a whole multiple of would stretch pixels unevenly
+		self.steps = [step for step in RENDER_SCALE_STEPS if (step <= scale and (scale / step).is_integer())] or [scale]
+		if (scale not in self.steps):
+			self.steps.insert(0, scale)
+		self.step = 0
+		self.level = None
+		self.frame_times = []
+		self.set_scale(scale)
+
+	@staticmethod
+	def internal_size(scale):
+		return (round(WINDOW_WIDTH * scale), round(WINDOW_HEIGHT * scale))
+
+	def set_scale(self, scale):
+		self.scale = scale
+		size = self.internal_size(scale)
+		if (self.window and size != self.display_surface.get_size()):
+			# SCALED makes the window the size of the display, it goes back to its size and SDL fills it with a whole number upscale
+			self.display_surface = pygame.display.set_mode(size, pygame.SCALED, vsync = int(self.vsync))
+			self.window.size = self.window_size
+		if (size == self.display_surface.get_size()):
+			# drawn straight into the display, nothing to copy
+			self.surface = self.display_surface
+		else:
+			self.surface = pygame.Surface(size).convert()
+		if (self.level):
+			self.level.set_render_target(self.surface, self.scale)
+
+	def attach(self, level):
+		self.level = level
+		level.set_render_target(self.surface, self.scale)
+
+	def draw(self, frame):
+		"""
+		frame: (surface, scale, render list) from Level.step. The surface is the one the list was scaled for, even if the scale changed since
+		"""
+		surface, scale, blits = frame
+		if (self.window and scale != self.scale and surface is self.display_surface):
+			# simulated before a step change made the display again at the new size, the last picture stays up for a frame
+			return surface
+		surface.fill("black")
+		surface.fblits(blits)
+		return surface
+
+	def present(self, surface = None):
+		surface = surface or self.surface
+		if (surface is not self.display_surface):
+			pygame.transform.scale(surface, self.display_surface.get_size(), self.display_surface)
+		pygame.display.flip()
+
+	def frame_done(self, frame_time):
+		"""
+		frame_time: ms of work in the last frame. In dynamic mode the scale steps down when the average is over budget and back up once there is plenty of room
+		"""
+		if (not self.dynamic):
+			return
+
+		self.frame_times.append(frame_time)
+		if (len(self.frame_times) < RENDER_SCALE_WINDOW):
+			return
+
+		average = sum(self.frame_times) / len(self.frame_times)
+		self.frame_times.clear()
+		if (average > FRAME_BUDGET and self.step < len(self.steps) - 1):
+			self.step += 1
+		elif (average < FRAME_BUDGET * 0.6 and self.step > 0):
+			self.step -= 1
+		else:
+			return
+		self.set_scale(self.steps[self.step])
@@ -9,6 +9,31 @@ TILE_SIZE = 70
 ANIMATION_SPEED = 6
 FPS_MAX = 60
 FPS_TARGET = 60
+# internal render resolution as a fraction of the window. 70 px tiles and the window size stay whole pixels at every step
+RENDER_SCALE = 1.0
+# steps of the dynamic scale, only whole fractions of the starting scale are used so presenting is an integer upscale
+RENDER_SCALE_STEPS = (1.0, 0.5)
+# "scaled": the display is created at the internal resolution with pygame.SCALED and SDL scales it to the window
+# "software": the display is window sized and lower resolutions are scaled into it with pygame.transform.scale
+RENDER_PRESENT = "scaled"
+# step the internal resolution down when frames go over budget, and back up when there is room
+DYNAMIC_RENDER_SCALE = False
+FRAME_BUDGET = 1000 / FPS_TARGET  # ms of work per frame
+RENDER_SCALE_WINDOW = 30    # frames averaged before the scale changes
+# how the main loop waits for the next frame: "sleep_spin", "busy_loop" (Clock.tick_busy_loop) or "vsync" (presenting blocks, needs RENDER_PRESENT "scaled")
+FRAME_PACING = "sleep_spin"
+PACING_SPIN = 2 # ms before the deadline where sleep_spin stops sleeping and spins
+PACING_MAX_DT = 3   # frames, longer stalls like a hot reload or a window drag are simulated as this
+VSYNC_CHECK_FRAMES = 30 # frames "vsync" pacing watches to see that presenting really waits
+PACING_REPORT = False   # print the frame jitter and input latency histograms on quit
+STARTUP_REPORT = False  # print how long each step of startup took
+# simulate the next frame on a worker thread while the current one is drawn and presented
+PIPELINED = False
+# watch the map file of the level being played and apply its changes while playing, for editing levels in Tiled
+HOT_RELOAD = False
+HOT_RELOAD_INTERVAL = 250   # ms between checks of the file
+# transparent color for images that only have fully opaque and fully transparent pixels
+COLORKEY = (255, 0, 255)
 
 # names of layers and objects from Tiled.
 TRIGGERS = "Triggers"
@@ -28,6 +53,10 @@ TERRAIN_BASIC = "Terrain_basic"
 BG_DETAILS = "BG_details"
 BG = "BG"
 
+# tile layers and object layers in the order they are built
+TILE_LAYERS = [BG, TERRAIN_BASIC, TERRAIN_R_RAMP, TERRAIN_L_RAMP, TERRAIN_FLOOR_ONLY, PLATFORMS_PARTIAL, FG]
+OBJECT_LAYERS = [BG_DETAILS, MID_DETAILS, MOVING_OBJECTS, GENERAL_OBJECTS, ENEMY_OBJECTS, ITEM_OBJECTS]
+
 # Layer order to be draw. Higher number is higher priority
 Z_LAYERS = {
     "invis": 0,
@@ -50,7 +79,62 @@ PLAYER_ACCEL = 0.85
 PLAYER_MAX_VEL_X = 15
 PLAYER_VEL_Y = 10   # 4 tile jump gap
 PLAYER_MAX_VEL_Y = 15
+PLAYER_HEALTH = 5
+PLAYER_INVULNERABLE = 1000  # ms after getting hit
+PLAYER_BALL_SPEED = 10
+PLAYER_BALL_MAX_CHARGE = 1000   # ms of holding the button for double speed
+ATTACK_HITBOX_WIDTH = 40
+ATTACK_HITBOX_LIFETIME = 8  # frames
 
 # Environment
 # note for 1:1 ramp. gravity displacement (velocity) is 1/1 of horizontal velocity rounded up. Adjusted in player.py
-GRAVITY_NORM = 0.33
\ No newline at end of file
+GRAVITY_NORM = 0.33
+# points a Bezier path of a moving object is sampled at when the level is built
+BEZIER_SAMPLES = 64
+
+# collision index cell, in pixels
+GRID_CELL_SIZE = TILE_SIZE * 2
+
+# Chunked world, maps at least this many tiles wide are streamed around the camera
+CHUNKED_MIN_WIDTH = 200
+CHUNK_COLUMNS = 16  # tiles per chunk
+CHUNK_EVICT_DISTANCE = TILE_SIZE * 32   # past the loaded area before a chunk is evicted
+
+# Enemies
+# behaviour for each enemy name in Tiled, can be overridden with a "behaviour" property on the object
+ENEMY_BEHAVIOURS = {
+    "dog": "patrol",
+    "squirrel": "patrol",
+    "wasp": "chase",
+    "bird": "shoot"
+}
+ENEMY_SPEED = {
+    "patrol": 2,
+    "chase": 3,
+    "shoot": 0
+}
+ENEMY_HEALTH = 2
+ENEMY_CHASE_RADIUS = TILE_SIZE * 6
+ENEMY_SHOOT_RANGE = TILE_SIZE * 8
+ENEMY_SHOOT_COOLDOWN = 1500 # ms
+ENEMY_PROJECTILE_SPEED = 6
+ENEMY_SHOT_SPREAD = 3   # projectiles per volley
+ENEMY_SHOT_ANGLE = 15   # degrees between them
+
+# Enemy AI scheduler
+ENEMY_FULL_RATE_MARGIN = TILE_SIZE * 2  # around the screen, AI runs every frame
+ENEMY_ACTIVITY_MARGIN = TILE_SIZE * 12  # beyond this the enemies are frozen
+ENEMY_REDUCED_INTERVAL = 4  # frames between AI ticks in between the two margins
+ENEMY_AI_BUDGET = 16    # reduced rate AI ticks per frame
+
+# Items, score for each item name in Tiled
+ITEM_VALUES = {
+    "kibble": 1,
+    "denta": 5,
+    "skull": 20
+}
+
+# Projectiles
+PROJECTILE_POOL_SIZE = 256
+PROJECTILE_SIZE = 16
+PROJECTILE_LIFETIME = 180 # frames
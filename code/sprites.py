@@ -1,56 +1,103 @@
-from math import sin, cos, radians
-
 from settings import *
+from support import is_visible, optimize_surface
+from animation import AnimationClock
+from paths import circle_point
 
 
 class Sprite(pygame.sprite.Sprite):
-	def __init__(self, pos, surf = pygame.Surface((TILE_SIZE,TILE_SIZE)), groups = None, type = None, z = Z_LAYERS["main"]):
+	def __init__(self, pos, surf = pygame.Surface((TILE_SIZE,TILE_SIZE)), groups = None, type = None, z = Z_LAYERS["main"], anchor = "topleft"):
 		
-		super().__init__(groups)
+		super().__init__()
 
 		self.image = surf
-		self.rect = self.image.get_frect(topleft = pos)
+		# pos is the anchor point of the rect, placed before joining the groups so the collision index sees the final position
+		self.rect = surf.get_frect(**{anchor: pos})
+		# fully transparent, the camera skips it
+		self.visible = is_visible(surf)
 
 		self.old_rect = self.rect.copy()
 		self.type = type
 		self.z = z
 
-class AnimatedSprite(Sprite):
-	def __init__(self, pos, frames, groups, type = None, z = Z_LAYERS["main"], animation_speed = ANIMATION_SPEED):
+		# join the groups once the rect exists, the collision index buckets by rect
+		if (groups):
+			self.add(groups)
 
-		self.frames, self.frame_index = frames, 0
-		self.len_frames = len(frames)
-		super().__init__(pos, self.frames[self.frame_index], groups, type, z)
+	def reset(self, pos, surf, groups, type, z):
+		"""
+		reuse a pooled sprite, sets it up the same as __init__
+		"""
+		self.image = surf
+		self.rect = surf.get_frect(topleft = pos)
+		self.visible = is_visible(surf)
+		self.old_rect = self.rect.copy()
+		self.type = type
+		self.z = z
+		self.add(groups)
 
+class AnimatedSprite(Sprite):
+	"""
+	Takes its frame from an AnimationClock. With a clock registry the clock is shared with every sprite using the same frames, speed and phase,
+	and the level advances it once per frame. Without one the sprite gets its own clock and advances it in update
+	"""
+	def __init__(self, pos, frames, groups, type = None, z = Z_LAYERS["main"], animation_speed = ANIMATION_SPEED, clocks = None, phase = 0, anchor = "topleft"):
+
+		self.frames = frames
 		self.animation_speed = animation_speed
+		self.own_clock = clocks is None
+		self.clock = AnimationClock(frames, animation_speed, phase) if self.own_clock else clocks.get(frames, animation_speed, phase)
+		super().__init__(pos, self.clock.image, groups, type, z, anchor)
+
+	@property
+	def image(self):
+		return self.clock.image
+
+	@image.setter
+	def image(self, surf):
+		# Sprite.__init__ sets the first frame, the clock decides after that
+		pass
 
-	def animate(self, dt):
-		self.frame_index += self.animation_speed * dt/FPS_TARGET
-		if (self.frame_index > self.len_frames):
-			self.frame_index = 0
-		self.image = self.frames[int(self.frame_index)]
+	@property
+	def visible(self):
+		# the frame changes, so checked on the one shown now. A fully transparent first frame doesn't hide the others
+		return is_visible(self.clock.image)
 
-	def update(self, dt, event_list):
-		self.animate(dt)
+	@visible.setter
+	def visible(self, value):
+		pass
+
+	def update(self, dt):
+		if (self.own_clock):
+			self.clock.advance(dt)
 
 class MovingSprite(AnimatedSprite):
-	def __init__(self, frames, start_pos, end_pos, path_plane, start_end = False, speed = 0, full_collision = True, flip = False, groups = None, type = None, z = Z_LAYERS["main"]):
+	def __init__(self, frames, start_pos, end_pos, path_plane, start_end = False, speed = 0, full_collision = True, flip = False, groups = None, type = None, z = Z_LAYERS["main"], clocks = None, path = None):
+
+		# movement, set before joining the groups so the collision index treats it as dynamic
+		self.moving = True
 
-		super().__init__(start_pos, frames, groups, type, z)
+		super().__init__(start_pos, frames, groups, type, z, clocks = clocks)
 		
 		self.start_pos = start_pos
 		self.end_pos = end_pos
 
-		# movement
-		self.moving = True
 		self.flip = flip
 		self.start_end = start_end
 		self.speed = speed
 		self.full_collision = full_collision
 		self.path_plane = path_plane
-
-
-		if (self.path_plane == "x"):
+		# Path to follow instead of the straight line from start_pos to end_pos
+		self.path = path
+
+
+		if (self.path):
+			# start_end starts at the end of the path and goes backwards
+			self.path_plane = path.plane
+			self.travel = -1 if start_end else 1
+			self.distance = path.length if (start_end and not path.closed) else 0
+			self.rect.center = path.point_at(self.distance)
+			self.direction = path.tangent_at(self.distance) * self.travel
+		elif (self.path_plane == "x"):
 			if (not start_end):
 				self.direction = vector(1, 0)
 				self.rect.midleft = start_pos
@@ -67,6 +114,35 @@ class MovingSprite(AnimatedSprite):
 
 		self.reverse = {'x': False, 'y': False}
 
+		# frames for when the direction is reversed, flipped on the axis of the path
+		if (self.flip):
+			flip_x, flip_y = self.path_plane == "x", self.path_plane == "y"
+			self.reversed_frames = clocks.flipped(frames, flip_x, flip_y) if clocks else [optimize_surface(pygame.transform.flip(frame, flip_x, flip_y)) for frame in frames]
+
+	@property
+	def image(self):
+		if (self.flip and self.reverse[self.path_plane]):
+			return self.reversed_frames[self.clock.index]
+		return self.clock.image
+
+	@image.setter
+	def image(self, surf):
+		pass
+
+	def save_state(self):
+		state = (tuple(self.rect), tuple(self.old_rect), tuple(self.direction), self.reverse['x'], self.reverse['y'])
+		if (self.path):
+			state += (self.distance, self.travel)
+		return state
+
+	def load_state(self, state):
+		rect, old_rect, direction, self.reverse['x'], self.reverse['y'] = state[:5]
+		if (self.path):
+			self.distance, self.travel = state[5:]
+		self.rect.update(rect)
+		self.old_rect.update(old_rect)
+		self.direction.update(direction)
+
 	def check_border(self):
 		if (self.path_plane == "x"):
 			if (self.rect.right >= self.end_pos[0] and self.direction.x == 1):
@@ -85,17 +161,48 @@ class MovingSprite(AnimatedSprite):
 				self.rect.top = self.start_pos[1]
 			self.reverse['y'] = True if self.direction.y > 0 else False
 
-	def update(self, dt, event_list):
+	def follow_path(self, dt):
+		"""
+		move speed * dt along the path, turning around at the ends of an open path and going round a closed one
+		"""
+		if (not self.path.length):
+			# every point in one place, nothing to follow
+			self.direction = vector(0, 0)
+			return
+
+		step = self.speed * dt
+		self.distance += self.travel * step
+		if (self.path.closed):
+			self.distance %= self.path.length
+		elif (self.distance >= self.path.length):
+			self.distance = self.path.length
+			self.travel = -1
+		elif (self.distance <= 0):
+			self.distance = 0
+			self.travel = 1
+
+		old_center = vector(self.rect.center)
+		self.rect.center = self.path.point_at(self.distance)
+		# what the platform really moved this frame, the player on it is moved by direction * speed * dt
+		if (step):
+			self.direction = (vector(self.rect.center) - old_center) / step
+		else:
+			self.direction = self.path.tangent_at(self.distance) * self.travel
+		self.reverse['x'] = self.direction.x < 0
+		self.reverse['y'] = self.direction.y > 0
+
+	def update(self, dt):
 		self.old_rect = self.rect.copy()
-		self.rect.center += self.direction * self.speed * dt
-		self.check_border()
+		if (self.path):
+			self.follow_path(dt)
+		else:
+			self.rect.center += self.direction * self.speed * dt
+			self.check_border()
 
-		self.animate(dt)
-		if (self.flip):
-			self.image = pygame.transform.flip(self.image, self.reverse['x'], self.reverse['y'])
+		super().update(dt)
 
 class Orbit(AnimatedSprite):
-	def __init__(self, pos, frames, radius, speed, start_angle, end_angle, groups, type = None,z = Z_LAYERS['main']):
+	def __init__(self, pos, frames, radius, speed, start_angle, end_angle, groups, type = None,z = Z_LAYERS['main'], clocks = None):
 		self.center = pos
 		self.radius = radius
 		self.speed = speed
@@ -105,15 +212,20 @@ class Orbit(AnimatedSprite):
 		self.direction = 1
 		self.full_circle = True if self.end_angle == -1 else False
 
-		# trigonometry
-		# sin(deg) = op/hyp
-		y = self.center[1] + sin(radians(self.angle)) * self.radius
-		# cos(deg) = adj/hyp
-		x = self.center[0] + cos(radians(self.angle)) * self.radius
+		super().__init__(self.orbit_point(), frames, groups, type, z, clocks = clocks)
+
+	def orbit_point(self):
+		# trigonometry, cos and sin come from the table in paths.py
+		cos_angle, sin_angle = circle_point(self.angle)
+		return (self.center[0] + cos_angle * self.radius, self.center[1] + sin_angle * self.radius)
+
+	def save_state(self):
+		return (self.angle, self.direction, self.rect.center)
 
-		super().__init__((x,y), frames, groups, type, z)
+	def load_state(self, state):
+		self.angle, self.direction, self.rect.center = state
 
-	def update(self, dt, event_list):
+	def update(self, dt):
 		self.angle += self.direction * self.speed * dt
 
 		if not self.full_circle:
@@ -123,8 +235,6 @@ class Orbit(AnimatedSprite):
 				self.direction = 1
 
 
-		y = self.center[1] + sin(radians(self.angle)) * self.radius
-		x = self.center[0] + cos(radians(self.angle)) * self.radius
-		self.rect.center = (x,y)
+		self.rect.center = self.orbit_point()
 
-		self.animate(dt)
\ No newline at end of file
+		super().update(dt)
\ No newline at end of file
@@ -0,0 +1,23 @@
+from time import perf_counter
+
+class StartupTimeline:
+	"""
+	Phases of startup in the order they finished, each timed from the end of the one before
+	"""
+	def __init__(self, start = None):
+		self.start = start or perf_counter()
+		self.last = self.start
+		self.phases = []
+
+	def mark(self, name):
+		now = perf_counter()
+		self.phases.append((name, now - self.last))
+		self.last = now
+
+	def report(self):
+		lines = ["startup timeline"]
+		total = 0
+		for name, seconds in self.phases:
+			total += seconds
+			lines.append(f"  {name:<16}{seconds * 1000:9.1f} ms{total * 1000:10.1f} ms")
+		return "\n".join(lines)
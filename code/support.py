@@ -2,9 +2,78 @@ from settings import *
 from os import walk
 from os.path import join
 
+# surfaces with no visible pixel, sprites using them are never drawn
+transparent_surfaces = set()
+
+def optimize_surface(surf):
+	"""
+	returns the cheapest surface to blit that looks the same as surf
+	fully opaque: no alpha. Alpha only 0 or 255: colorkey with RLE. Soft edges: per pixel alpha with RLE. Fully transparent: kept and recorded in transparent_surfaces
+	"""
+	if (not surf.get_flags() & pygame.SRCALPHA):
+		return surf.convert()
+
+	width, height = surf.get_size()
+	visible_mask = pygame.mask.from_surface(surf, 0)
+	visible = visible_mask.count()
+	if (visible == 0):
+		transparent_surfaces.add(surf)
+		return surf
+
+	opaque = pygame.mask.from_surface(surf, 254).count()
+	if (opaque == width * height):
+		return surf.convert()
+
+	if (opaque == visible):
+		# the key color must not be used by a visible pixel
+		key_mask = pygame.mask.from_threshold(surf, COLORKEY, (1, 1, 1, 255))
+		if (not key_mask.overlap_area(visible_mask, (0, 0))):
+			keyed = pygame.Surface((width, height)).convert()
+			keyed.fill(COLORKEY)
+			keyed.blit(surf, (0, 0))
+			keyed.set_colorkey(COLORKEY, pygame.RLEACCEL)
+			return keyed
+
+	surf = surf.convert_alpha()
+	surf.set_alpha(255, pygame.RLEACCEL)
+	return surf
+
+def scale_surface(surf, scale):
+	"""
+	surf resized for a lower render resolution, keeping the blit format optimize_surface picked
+	"""
+	scaled = pygame.transform.scale_by(surf, scale)
+	if (surf in transparent_surfaces):
+		transparent_surfaces.add(scaled)
+	elif (surf.get_colorkey()):
+		scaled.set_colorkey(surf.get_colorkey(), pygame.RLEACCEL)
+	elif (surf.get_flags() & pygame.SRCALPHA):
+		scaled.set_alpha(255, pygame.RLEACCEL)
+	return scaled
+
+def optimize_tmx_images(tmx_map):
+	"""
+	optimize_surface for every tile image of a map loaded by pytmx, objects and layers look their images up in this list
+	"""
+	for gid, image in enumerate(tmx_map.images):
+		if (image):
+			tmx_map.images[gid] = optimize_surface(image)
+	return tmx_map
+
+def is_visible(surf):
+	return surf not in transparent_surfaces
+
 def import_image(*path, alpha = True, format = 'png'):
 	full_path = join(*path) + f'.{format}'
-	return pygame.image.load(full_path).convert_alpha() if alpha else pygame.image.load(full_path).convert()
+	return optimize_surface(pygame.image.load(full_path).convert_alpha()) if alpha else pygame.image.load(full_path).convert()
+
+def make_ball(radius, color):
+	"""
+	returns a surface with a filled circle, for things that have no graphics yet
+	"""
+	surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+	pygame.draw.circle(surf, color, (radius, radius), radius)
+	return optimize_surface(surf.convert_alpha())
 
 def import_folder(*path):
 	"""
@@ -14,7 +83,7 @@ def import_folder(*path):
 	for folder_path, subfolders, image_names in walk(join(*path)):
 		for image_name in sorted(image_names, key = lambda name: int(name.split('.')[0])):
 			full_path = join(folder_path, image_name)
-			frames.append(pygame.image.load(full_path).convert_alpha())
+			frames.append(optimize_surface(pygame.image.load(full_path).convert_alpha()))
 	return frames 
 
 def import_folder_dict(*path):
@@ -22,7 +91,7 @@ def import_folder_dict(*path):
 	for folder_path, _, image_names in walk(join(*path)):
 		for image_name in image_names:
 			full_path = join(folder_path, image_name)
-			surface = pygame.image.load(full_path).convert_alpha()
+			surface = optimize_surface(pygame.image.load(full_path).convert_alpha())
 			frame_dict[image_name.split('.')[0]] = surface
 	return frame_dict
 
@@ -1,4 +1,25 @@
-from pygame.time import get_ticks
+from time import perf_counter
+
+started = perf_counter()
+
+def clock_ms():
+	"""
+	ms since this module was imported. Like pygame.time.get_ticks, but it runs without pygame.init()
+	"""
+	return int((perf_counter() - started) * 1000)
+
+# where timers read the time in ms. Replays and tests swap it for a clock they control
+time_source = clock_ms
+
+def get_ticks():
+	return time_source()
+
+def set_time_source(source = None):
+	"""
+	source: function returning ms, None goes back to clock_ms
+	"""
+	global time_source
+	time_source = source or clock_ms
 
 class Timer:
 	def __init__(self, duration, func = None, repeat = False):
@@ -20,6 +41,14 @@ class Timer:
 		if self.repeat:
 			self.activate()
 
+	def save_state(self):
+		# time since activation instead of the tick it started, so it can be restored at any later time
+		return (self.active, get_ticks() - self.start_time if self.active else 0)
+
+	def load_state(self, state):
+		self.active, elapsed = state
+		self.start_time = get_ticks() - elapsed if self.active else 0
+
 	def update(self):
 		current_time = get_ticks()
 		if current_time - self.start_time >= self.duration: